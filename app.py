@@ -1,26 +1,120 @@
 import argparse
+import contextlib
 import json
+import sys
 
-from scraper.scraper import Worker
+from scraper.scraper import Worker, AsyncWorker
+from scraper.cache import ResponseCache
+from scraper.sinks import NDJSONSink
+from scraper.tasks import iter_tasks
+from scraper.journal import Journal
+from scraper.metrics import Metrics
+from scraper.archive import HttpArchive
+from scraper.taskqueue import SQLiteTaskQueue, run_from_queue
+from scraper.fingerprints import PageStore
+from scraper.service import ScrapeService, serve
 
 
-def process_file(file_path):
+def build_worker(args) -> Worker:
+    sink = NDJSONSink(args.output, flush_every=args.flush_every) if args.format == 'ndjson' else None
+    journal = Journal(args.journal, resume=args.resume) if args.journal else None
+    metrics = Metrics() if args.metrics_file else None
+    record = HttpArchive(args.record) if args.record else None
+    if record:
+        record.clear()
+    replay = HttpArchive(args.replay) if args.replay else None
+    page_store = PageStore(args.page_store, refresh=args.force_refresh) if args.page_store else None
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(args.cache_dir, ttl=args.cache_ttl, max_bytes=args.cache_size * 1024 * 1024)
+
+    if args.mode == 'async':
+        return AsyncWorker(
+            max_concurrency=args.concurrency,
+            pool_size=args.pool_size,
+            cache=cache,
+            parse_processes=args.parse_processes,
+            sink=sink,
+            journal=journal,
+            metrics=metrics,
+            record=record,
+            replay=replay,
+            page_store=page_store,
+            chunk_arrays=args.chunk_arrays,
+        )
+
+    return Worker(
+        pool_size=args.pool_size or 10,
+        cache=cache,
+        sink=sink,
+        journal=journal,
+        metrics=metrics,
+        record=record,
+        replay=replay,
+        page_store=page_store,
+        chunk_arrays=args.chunk_arrays,
+    )
+
+
+def write_json(data: str, output: str | None) -> None:
+    if not output:
+        print(data)
+        return
+
+    with open(output, 'w') as file:
+        file.write(data)
+
+
+def process_file(file_path, args):
+    queue = None
     try:
-        with open(file_path, 'r') as file:
-            tasks = json.load(file)
+        with open(file_path, 'r') if file_path else contextlib.nullcontext() as file:
+            if args.queue:
+                queue = SQLiteTaskQueue(args.queue, lease_timeout=args.lease_timeout)
+                if file:
+                    print(f'{queue.put(iter_tasks(file))} tasks added to {args.queue}', file=sys.stderr)
+
+            worker = build_worker(args)
+            if not queue:
+                if args.stream:
+                    worker.add_task_stream(iter_tasks(file), queue_size=args.queue_size)
+                else:
+                    worker.add_tasks(json.load(file))
+            try:
+                if queue:
+                    run_from_queue(worker, queue, args.worker_id, batch_size=args.lease_batch)
+                else:
+                    worker.run_tasks()
+            finally:
+                worker.close()
+                if queue:
+                    queue.close()
+                if worker.metrics:
+                    worker.metrics.write(args.metrics_file, args.metrics_format)
 
-            worker = Worker()
-            worker.add_tasks(tasks)
-            worker.run_tasks()
-            data = worker.get_json_scraped_data()
-            print(data)
+            if args.format == 'json':
+                write_json(worker.get_json_scraped_data(), args.output)
 
     except FileNotFoundError:
-        print(f"Error: File '{file_path}' not found")
+        print(f"Error: File '{file_path}' not found", file=sys.stderr)
     except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {str(e)}")
+        print(f"Error decoding JSON: {str(e)}", file=sys.stderr)
     except Exception as e:
-        print(f"Error processing file: {str(e)}")
+        print(f"Error processing file: {str(e)}", file=sys.stderr)
+
+
+def run_service(args):
+    # the sync worker would stop on an empty task source
+    args.mode = 'async'
+    args.format = None
+    service = ScrapeService(build_worker(args), batch_ttl=args.batch_ttl, wait_timeout=args.wait_timeout)
+    try:
+        serve(service, args.serve)
+    except Exception as e:
+        print(f"Error running service: {str(e)}", file=sys.stderr)
+    finally:
+        if service.worker.metrics:
+            service.worker.metrics.write(args.metrics_file, args.metrics_format)
 
 
 def main():
@@ -31,13 +125,211 @@ def main():
     parser.add_argument(
         '-f', '--file',
         type=str,
-        required=True,
-        help='Path to the JSON file to parse'
+        help='Path to the JSON file to parse, with --queue its tasks are added to the queue'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Read tasks lazily from a JSON array or NDJSON file while scraping'
+    )
+
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=100,
+        help='Max number of tasks read ahead in stream mode'
+    )
+
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        help='Write results to this file instead of the console'
+    )
+
+    parser.add_argument(
+        '--format',
+        choices=['json', 'ndjson'],
+        default='json',
+        help='One JSON list at the end, or one JSON line per result as soon as it is finished'
+    )
+
+    parser.add_argument(
+        '--flush-every',
+        type=int,
+        default=100,
+        help='Flush NDJSON output every N results'
+    )
+
+    parser.add_argument(
+        '--chunk-arrays',
+        action='store_true',
+        help='Write the array sections of every page as chunk lines as soon as the page is scraped, '
+             'the result line of the task then has only its other sections, requires --format ndjson'
+    )
+
+    parser.add_argument(
+        '--journal',
+        type=str,
+        help='SQLite file recording scraped pages and finished tasks'
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue the run recorded in --journal, finished tasks are emitted again '
+             'from the journal, write NDJSON output to a new file'
+    )
+
+    parser.add_argument(
+        '-m', '--mode',
+        choices=['sync', 'async'],
+        default='sync',
+        help='Run extractors one by one or many at once'
+    )
+
+    parser.add_argument(
+        '-c', '--concurrency',
+        type=int,
+        default=20,
+        help='Max number of extractors in flight in async mode'
+    )
+
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        help='Max number of keep-alive connections per carrier host'
+    )
+
+    parser.add_argument(
+        '--parse-processes',
+        type=int,
+        help='Parse pages in a pool of that many processes (async mode)'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help='Directory for the on-disk response cache, disabled if not set'
+    )
+
+    parser.add_argument(
+        '--cache-ttl',
+        type=float,
+        default=3600,
+        help='Seconds a cached response is used without revalidation'
+    )
+
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=500,
+        help='Max size of the response cache in MB'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        type=str,
+        help='Write stage timings and counters to this file, disabled if not set'
+    )
+
+    parser.add_argument(
+        '--metrics-format',
+        choices=['json', 'prometheus'],
+        default='json',
+        help='JSON summary or Prometheus text file'
+    )
+
+    archive = parser.add_mutually_exclusive_group()
+    archive.add_argument(
+        '--record',
+        type=str,
+        help='Save every response to this archive file'
+    )
+
+    archive.add_argument(
+        '--replay',
+        type=str,
+        help='Serve responses from this archive file instead of the network'
+    )
+
+    parser.add_argument(
+        '--queue',
+        type=str,
+        help='SQLite task queue shared by several workers, '
+             'each worker runs leased tasks until the queue is finished'
+    )
+
+    parser.add_argument(
+        '--worker-id',
+        type=str,
+        help='Name of this worker in the queue, host:pid by default'
+    )
+
+    parser.add_argument(
+        '--lease-timeout',
+        type=float,
+        default=60,
+        help='Seconds before tasks of a worker without heartbeats are leased again'
+    )
+
+    parser.add_argument(
+        '--lease-batch',
+        type=int,
+        default=10,
+        help='Number of tasks leased at once'
+    )
+
+    parser.add_argument(
+        '--page-store',
+        type=str,
+        help='SQLite file of page hashes and scraped data, unchanged pages are not parsed again'
+    )
+
+    parser.add_argument(
+        '--force-refresh',
+        action='store_true',
+        help='Parse every page even if it is unchanged in --page-store'
+    )
+
+    parser.add_argument(
+        '--serve',
+        type=str,
+        help='Run as a service on HOST:PORT or a unix socket path, '
+             'task batches are submitted over HTTP to one warm async worker'
+    )
+
+    parser.add_argument(
+        '--batch-ttl',
+        type=float,
+        default=3600,
+        help='Seconds the service keeps results of a finished batch'
+    )
+
+    parser.add_argument(
+        '--wait-timeout',
+        type=float,
+        default=60,
+        help='Seconds a service request with ?wait=1 waits for results'
     )
 
     args = parser.parse_args()
+    if args.resume and not args.journal:
+        parser.error('--resume requires --journal')
+    if args.serve:
+        if args.file or args.queue or args.journal:
+            parser.error('--serve takes tasks over HTTP, not with -f, --queue or --journal')
+    elif not args.file and not args.queue:
+        parser.error('-f/--file, --queue or --serve is required')
+    if args.force_refresh and not args.page_store:
+        parser.error('--force-refresh requires --page-store')
+    if args.chunk_arrays and (args.format != 'ndjson' or args.queue or args.serve):
+        parser.error('--chunk-arrays requires --format ndjson, not with --queue or --serve')
 
-    process_file(args.file)
+    if args.serve:
+        run_service(args)
+    else:
+        process_file(args.file, args)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,290 @@
+"""
+End-to-end throughput benchmark, runs the workers against the local mock server:
+
+    python -m bench.harness --tasks 500 --mode async --save bench/baselines/default.json
+    python -m bench.harness --compare bench/baselines/default.json
+
+--compare reruns the scenario stored in the baseline and exits with 1
+when a metric got worse by more than --tolerance
+"""
+import argparse
+import contextlib
+import dataclasses
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import carriers
+
+from scraper.extractor import Extractor
+from scraper.journal import task_key
+from scraper.models import ResultModel, ResultStatus
+from scraper.scraper import Worker, AsyncWorker
+from scraper.sinks import BaseResultSink
+
+from .mock_server import ServerOptions, add_server_arguments, server_options
+
+
+# metric name -> True if higher is better
+METRICS = {
+    'tasks_per_sec': True,
+    'pages_per_sec': True,
+    'latency_p50': False,
+    'latency_p99': False,
+    'cpu_time': False,
+    'peak_rss_mb': False,
+}
+
+
+@dataclasses.dataclass
+class Scenario:
+    tasks: int = 200
+    carriers: list[str] = dataclasses.field(
+        default_factory=lambda: ['MOCK_INDEMNITY', 'PLACEHOLDER_CARRIER'])
+    mode: str = 'async'
+    concurrency: int = 20
+    parse_processes: int | None = None
+    # requests per second of every carrier, None keeps ParserConfig.rate_limit
+    rate: float | None = None
+    # ParserConfig.hedge_requests of every carrier
+    hedge: bool = False
+    # ParserConfig.stream_pages of every carrier
+    stream: bool = False
+    server: ServerOptions = dataclasses.field(default_factory=ServerOptions)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Scenario':
+        return cls(**{**data, 'server': ServerOptions(**data['server'])})
+
+
+class LatencySink(BaseResultSink):
+    """
+    Counts results and the time from the first fetch of every task
+    to its result, results themselves are dropped
+    """
+    def __init__(self):
+        self.extractors: dict[str, Extractor] = {}
+        self.latencies: list[float] = []
+        self.statuses: dict[str, int] = {}
+
+    def write(self, result: ResultModel) -> None:
+        extractor = self.extractors.pop(task_key(result.carrier, result.arguments), None)
+        if extractor and extractor.started_at is not None:
+            self.latencies.append(time.monotonic() - extractor.started_at)
+        self.statuses[result.status] = self.statuses.get(result.status, 0) + 1
+
+
+class MockServerProcess:
+    """
+    Mock server in its own process, so its CPU time isn't counted
+    """
+    def __init__(self, options: ServerOptions):
+        argv = [sys.executable, '-m', 'bench.mock_server', '--port', '0']
+        for name, value in dataclasses.asdict(options).items():
+            flag = f'--{name.replace("_", "-")}'
+            if isinstance(value, bool):
+                argv += [flag] if value else []
+            else:
+                argv += [flag, str(value)]
+
+        self.process = subprocess.Popen(argv, stdout=subprocess.PIPE, text=True)
+        line = self.process.stdout.readline()
+        if not line.startswith('Serving on '):
+            self.process.kill()
+            raise RuntimeError(f'Mock server failed to start: {line!r}')
+        self.url = line.removeprefix('Serving on ').strip()
+
+    def stats(self) -> dict[str, int]:
+        with urlopen(f'{self.url}/_stats') as response:
+            return json.load(response)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+@contextlib.contextmanager
+def local_carriers(url: str, rate: float | None = None, **options):
+    """
+    Points every carrier at url for the duration of the block,
+    options are set on every ParserConfig
+    """
+    mapping = dict(carriers.CARRIER_MAPPING)
+    try:
+        for carrier_id, config in mapping.items():
+            parsed = urlparse(config.url_template)
+            changes = {'url_template': config.url_template.replace(
+                f'{parsed.scheme}://{parsed.netloc}', url, 1), **options}
+            if rate is not None:
+                changes['rate_limit'] = dataclasses.replace(
+                    config.rate_limit, rate=rate, max_rate=max(rate, config.rate_limit.max_rate))
+            carriers.CARRIER_MAPPING[carrier_id] = dataclasses.replace(config, **changes)
+        yield
+    finally:
+        carriers.CARRIER_MAPPING.update(mapping)
+
+
+def _percentile(values: list[float], percent: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def _cpu_time(who: int) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss_mb() -> float:
+    # bytes on macOS, kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def make_worker(scenario: Scenario, sink: BaseResultSink) -> Worker:
+    if scenario.mode == 'async':
+        return AsyncWorker(
+            max_concurrency=scenario.concurrency,
+            parse_processes=scenario.parse_processes,
+            sink=sink,
+        )
+    return Worker(sink=sink)
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    server = MockServerProcess(scenario.server)
+    try:
+        with local_carriers(
+                server.url, scenario.rate, hedge_requests=scenario.hedge, stream_pages=scenario.stream):
+            sink = LatencySink()
+            worker = make_worker(scenario, sink)
+            make_extractor = worker._make_extractor
+
+            def tracked_extractor(task: dict) -> Extractor | None:
+                extractor = make_extractor(task)
+                if extractor:
+                    sink.extractors[extractor.key] = extractor
+                return extractor
+
+            worker._make_extractor = tracked_extractor
+            worker.add_task_stream(
+                {'carrier': scenario.carriers[i % len(scenario.carriers)], 'customerId': f'bench-{i}'}
+                for i in range(scenario.tasks)
+            )
+
+            cpu_start = _cpu_time(resource.RUSAGE_SELF) + _cpu_time(resource.RUSAGE_CHILDREN)
+            start = time.perf_counter()
+            # per request logging would dominate the measurement
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stderr(devnull):
+                try:
+                    worker.run_tasks()
+                finally:
+                    worker.close()
+            elapsed = time.perf_counter() - start
+            # parse processes are reaped by close(), the server isn't yet
+            cpu_time = (_cpu_time(resource.RUSAGE_SELF)
+                        + _cpu_time(resource.RUSAGE_CHILDREN) - cpu_start)
+
+        responses = server.stats()
+    finally:
+        server.stop()
+
+    return {
+        'elapsed': round(elapsed, 3),
+        'tasks_per_sec': round(scenario.tasks / elapsed, 2),
+        'pages_per_sec': round(responses.get('200', 0) / elapsed, 2),
+        'latency_p50': round(_percentile(sink.latencies, 50), 4),
+        'latency_p99': round(_percentile(sink.latencies, 99), 4),
+        'cpu_time': round(cpu_time, 3),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'failed_tasks': sink.statuses.get(ResultStatus.error.value, 0),
+        'responses': responses,
+    }
+
+
+def compare(baseline: dict, result: dict, tolerance: float) -> list[str]:
+    """
+    Metrics worse than the baseline by more than tolerance (a fraction)
+    """
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline[name], result[name]
+        if higher_is_better:
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions.append(f'{name}: {old} -> {new}')
+
+    if result['failed_tasks'] > baseline['failed_tasks']:
+        regressions.append(f'failed_tasks: {baseline["failed_tasks"]} -> {result["failed_tasks"]}')
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scraper throughput benchmark')
+    defaults = Scenario()
+    parser.add_argument('--tasks', type=int, default=defaults.tasks)
+    parser.add_argument('--carriers', default=','.join(defaults.carriers),
+                        help='Comma separated carrier ids, tasks are spread evenly')
+    parser.add_argument('-m', '--mode', choices=['sync', 'async'], default=defaults.mode)
+    parser.add_argument('-c', '--concurrency', type=int, default=defaults.concurrency)
+    parser.add_argument('--parse-processes', type=int, default=None)
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Requests per second of every carrier, overrides ParserConfig.rate_limit')
+    parser.add_argument('--hedge', action='store_true', help='Hedge requests of every carrier')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stop reading pages after their sections for every carrier')
+    add_server_arguments(parser)
+    parser.add_argument('--save', help='Write the scenario and its metrics to this baseline file')
+    parser.add_argument('--compare', help='Rerun the scenario of this baseline file and compare')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression of every metric')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        scenario = Scenario.from_dict(baseline['scenario'])
+    else:
+        baseline = None
+        scenario = Scenario(
+            tasks=args.tasks,
+            carriers=args.carriers.split(','),
+            mode=args.mode,
+            concurrency=args.concurrency,
+            parse_processes=args.parse_processes,
+            rate=args.rate,
+            hedge=args.hedge,
+            stream=args.stream,
+            server=server_options(args),
+        )
+
+    result = run_scenario(scenario)
+    print(json.dumps(result, indent=4))
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({'scenario': dataclasses.asdict(scenario), 'metrics': result}, file, indent=4)
+            file.write('\n')
+
+    if baseline:
+        regressions = compare(baseline['metrics'], result, args.tolerance)
+        if regressions:
+            print('Regressions against the baseline:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
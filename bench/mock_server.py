@@ -0,0 +1,300 @@
+"""
+Local stand-in for the carrier sites, serves MOCK_INDEMNITY and
+PLACEHOLDER_CARRIER shaped pages:
+
+    python -m bench.mock_server --port 8000 --latency 0.05 --rate-429 0.01
+    python -m bench.mock_server --port 8000 --stall-rate 0.01 --stall 5
+
+GET /_stats returns the number of responses sent by status code
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+from collections import Counter
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+@dataclass
+class ServerOptions:
+    # policies of a MOCK_INDEMNITY customer, all on one page
+    policies: int = 10
+    # pages of a PLACEHOLDER_CARRIER customer and policies on each of them
+    pages: int = 3
+    policies_per_page: int = 10
+    # seconds before every response, +- jitter
+    latency: float = 0.0
+    jitter: float = 0.0
+    # share of requests held for stall seconds more, stuck requests of the tail
+    stall_rate: float = 0.0
+    stall: float = 5.0
+    # share of requests answered with 429 / 500
+    rate_429: float = 0.0
+    error_rate: float = 0.0
+    retry_after: float = 0.1
+    # KB of markup after the scraped sections of every page
+    footer_kb: int = 0
+    # gzip bodies of clients accepting it
+    gzip: bool = False
+    seed: int = 0
+
+
+def render_mock_indemnity(customer_id: str, policies: int) -> str:
+    rows = ''.join(f'''
+      <li class="list-group-item">
+        <span class="id">MI-{customer_id}-{i}</span>
+        <span class="premium">${100 * i}.00</span>
+        <span class="status">Active</span>
+        <span class="effectiveDate">01/{i % 28 + 1:02}/2023</span>
+        <span class="terminationDate">01/{i % 28 + 1:02}/2024</span>
+        <span class="lastPaymentDate">06/{i % 28 + 1:02}/2023</span>
+      </li>''' for i in range(1, policies + 1))
+
+    return f'''<!DOCTYPE html>
+<html><head><title>Mock Indemnity</title></head>
+<body>
+  <div class="container">
+    <div class="agent-detail card">
+      <div><b>Name:</b> <span class="value-name">John Doe</span></div>
+      <div><b>Producer Code:</b> <span class="value-producerCode">PC-1234</span></div>
+      <div><b>Agency Name:</b> <span class="value-agencyName">Acme &amp; Co</span></div>
+      <div><b>Agency Code:</b> <span class="value-agencyCode">AC-99</span></div>
+    </div>
+    <div class="customer-detail card">
+      <div><b>Id:</b> <span class="value-id">{customer_id}</span></div>
+      <div><b>Name:</b> <span class="value-name">Bob Smith</span></div>
+      <div><b>Email:</b> <span class="value-email">bob@example.com</span></div>
+      <div><b>Address:</b> <span class="value-address">1 Main St, Springfield</span></div>
+    </div>
+    <ul id="policy-list" class="list-group">{rows}
+    </ul>
+  </div>
+</body></html>
+'''
+
+
+def render_placeholder_carrier(customer_id: str, page: int, policies_per_page: int) -> str:
+    rows = ''
+    for i in range((page - 1) * policies_per_page + 1, page * policies_per_page + 1):
+        rows += f'''
+        <tr class="policy-info-row" data-bs-toggle="collapse" data-bs-target="#policy-{i}-details">
+          <td>PC-{customer_id}-{i}</td>
+          <td>${50 * i}.00</td>
+          <td>Active</td>
+          <td>02/{i % 28 + 1}/2022</td>
+          <td>02/{i % 28 + 1}/2023</td>
+        </tr>
+        <tr class="collapse" id="policy-{i}-details">
+          <td colspan="5"><div>Last Payment Date: 7/{i % 28 + 1}/2022</div><div>Commission Rate: {i % 30}%</div><div>Number of Insureds: {i % 5 + 1}</div></td>
+        </tr>'''
+
+    return f'''<!DOCTYPE html>
+<html><head><title>Placeholder Carrier</title></head>
+<body>
+  <div class="agency-details">
+    <div class="nice-formatted-kv"><label for="name">Name:</label><span>Jane Roe</span></div>
+    <div class="nice-formatted-kv"><label for="producerCode">Producer Code:</label><span>PR-77</span></div>
+    <div class="nice-formatted-kv"><label for="agencyName">Agency Name:</label><span>Roe Agency</span></div>
+    <div class="nice-formatted-kv"><label for="agencyCode">Agency Code:</label><span>RA-5</span></div>
+  </div>
+  <div class="customer-details">
+    <div><label>Customer Id:</label><span>{customer_id}</span></div>
+    <div><label for="name">Name:</label><span>Alice Smith</span></div>
+    <div><label>SSN:</label><span>123456789</span></div>
+    <div><label>Email:</label>alice@example.com<div></div></div>
+    <div>Address: 42 Elm St, Shelbyville</div>
+  </div>
+  <table class="table policies">
+    <thead><tr><th>Id</th><th>Premium</th><th>Status</th><th>Effective</th><th>Termination</th></tr></thead>
+    <tbody>{rows}
+    </tbody>
+  </table>
+</body></html>
+'''
+
+
+def with_footer(page: str, footer_kb: int) -> str:
+    """
+    Adds footer_kb KB of links before </body>, like the footers and
+    scripts of real pages that follow the scraped sections
+    """
+    if not footer_kb:
+        return page
+    link = '<li><a href="/help/{0}">Help topic {0}</a></li>\n'
+    footer, i = '', 0
+    while len(footer) < footer_kb * 1024:
+        footer += link.format(i)
+        i += 1
+    return page.replace('</body>', f'<footer><ul>\n{footer}</ul></footer>\n</body>', 1)
+
+
+MOCK_INDEMNITY_PATH = re.compile(r'^/mock_indemnity/(?P<customer_id>[^/]+)$')
+PLACEHOLDER_CARRIER_PATH = re.compile(
+    r'^/placeholder_carrier/(?P<customer_id>[^/]+)/policies/(?P<page>\d+)$')
+
+
+class MockCarrierHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are separate writes, with Nagle a reused
+    # connection waits for the delayed ack of the headers
+    disable_nagle_algorithm = True
+    server: 'MockCarrierServer'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: str = '', headers: dict | None = None) -> None:
+        data = body.encode()
+        headers = dict(headers or {})
+        if self.server.options.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(status)
+
+    def do_GET(self) -> None:
+        options = self.server.options
+        if self.path == '/_stats':
+            self._send(200, json.dumps(self.server.stats()))
+            return
+
+        if options.latency or options.jitter:
+            time.sleep(max(options.latency + self.server.random(-1, 1) * options.jitter, 0))
+        if options.stall_rate and self.server.random(0, 1) < options.stall_rate:
+            time.sleep(options.stall)
+
+        chance = self.server.random(0, 1)
+        if chance < options.rate_429:
+            self._send(429, headers={'Retry-After': str(options.retry_after)})
+            return
+        if chance < options.rate_429 + options.error_rate:
+            self._send(500, 'Internal Server Error')
+            return
+
+        if match := MOCK_INDEMNITY_PATH.match(self.path):
+            self._send(200, with_footer(
+                render_mock_indemnity(match['customer_id'], options.policies), options.footer_kb))
+        elif (match := PLACEHOLDER_CARRIER_PATH.match(self.path)) and 0 < int(match['page']) <= options.pages:
+            self._send(200, with_footer(render_placeholder_carrier(
+                match['customer_id'], int(match['page']), options.policies_per_page), options.footer_kb))
+        else:
+            self._send(404, 'Not Found')
+
+
+class MockCarrierServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, options: ServerOptions, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), MockCarrierHandler)
+        self.options = options
+        self._random = random.Random(options.seed)
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def random(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._random.uniform(low, high)
+
+    def count(self, status: int) -> None:
+        with self._lock:
+            self._counts[status] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {str(status): count for status, count in self._counts.items()}
+
+    def start(self) -> 'MockCarrierServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def handle_error(self, request, client_address) -> None:
+        # clients hang up on timeouts and on pages they stopped reading
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = ServerOptions()
+    parser.add_argument('--policies', type=int, default=defaults.policies,
+                        help='Policies of a MOCK_INDEMNITY customer')
+    parser.add_argument('--pages', type=int, default=defaults.pages,
+                        help='Pages of a PLACEHOLDER_CARRIER customer')
+    parser.add_argument('--policies-per-page', type=int, default=defaults.policies_per_page,
+                        help='Policies on a PLACEHOLDER_CARRIER page')
+    parser.add_argument('--latency', type=float, default=defaults.latency,
+                        help='Seconds before every response')
+    parser.add_argument('--jitter', type=float, default=defaults.jitter,
+                        help='Random +- seconds added to latency')
+    parser.add_argument('--stall-rate', type=float, default=defaults.stall_rate,
+                        help='Share of requests held for --stall seconds')
+    parser.add_argument('--stall', type=float, default=defaults.stall,
+                        help='Seconds a stalled request is held')
+    parser.add_argument('--rate-429', type=float, default=defaults.rate_429,
+                        help='Share of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate,
+                        help='Share of requests answered with 500')
+    parser.add_argument('--retry-after', type=float, default=defaults.retry_after,
+                        help='Retry-After of 429 responses, seconds')
+    parser.add_argument('--footer-kb', type=int, default=defaults.footer_kb,
+                        help='KB of markup after the scraped sections of every page')
+    parser.add_argument('--gzip', action='store_true', default=defaults.gzip,
+                        help='Gzip bodies of clients accepting it')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def server_options(args: argparse.Namespace) -> ServerOptions:
+    return ServerOptions(
+        policies=args.policies,
+        pages=args.pages,
+        policies_per_page=args.policies_per_page,
+        latency=args.latency,
+        jitter=args.jitter,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        rate_429=args.rate_429,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        footer_kb=args.footer_kb,
+        gzip=args.gzip,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve carrier shaped pages locally')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockCarrierServer(server_options(args), args.host, args.port)
+    print(f'Serving on {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
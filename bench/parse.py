@@ -0,0 +1,122 @@
+"""
+Parse-only benchmark over pages recorded with app.py --record, no network:
+
+    python -m bench.parse archive.db [--parser lxml] [--repeat 3]
+
+Every archived 200 page is parsed with the config of the carrier whose
+url_template matches its url. Reports time per page and per field
+"""
+import argparse
+import dataclasses
+import json
+import re
+import statistics
+import time
+
+from carriers import CARRIER_MAPPING
+from carriers.models import ParserConfig
+
+from scraper.archive import HttpArchive
+from scraper.extractor import Extractor
+from scraper.metrics import Metrics
+
+
+def template_pattern(url_template: str) -> re.Pattern:
+    """
+    Regex matching urls built from url_template, placeholders become groups
+    """
+    pattern = re.sub(r'<(\w+)>', r'(?P<\1>[^/?#]+)', re.escape(url_template))
+    return re.compile(f'^{pattern}$')
+
+
+def archived_pages(archive: HttpArchive) -> list[tuple[str, ParserConfig, str, bool]]:
+    """
+    (carrier id, config, page text, first page) of the last 200 response of every url
+    """
+    patterns = {carrier_id: template_pattern(config.url_template)
+                for carrier_id, config in CARRIER_MAPPING.items()}
+    pages = {}
+
+    for archived in archive:
+        if archived.status_code != 200:
+            continue
+
+        for carrier_id, pattern in patterns.items():
+            match = pattern.match(archived.url)
+            if not match:
+                continue
+
+            config = CARRIER_MAPPING[carrier_id]
+            page = match.groupdict().get('page')
+            first_page = page is None or int(page) == config.start_page
+            pages[archived.url] = (
+                carrier_id, config, archived.to_response().text, first_page)
+            break
+
+    return list(pages.values())
+
+
+def run(pages: list, parser: str | None = None, repeat: int = 1) -> dict:
+    metrics = Metrics()
+    page_times = {}
+
+    for _ in range(repeat):
+        for carrier_id, config, html_text, first_page in pages:
+            if parser:
+                config = dataclasses.replace(config, parser=parser)
+            start = time.perf_counter()
+            Extractor.scrape_page(config, html_text, first_page, metrics.bind(carrier=carrier_id))
+            page_times.setdefault(carrier_id, []).append(time.perf_counter() - start)
+
+    report = {}
+    for carrier_id, times in page_times.items():
+        report[carrier_id] = {
+            'pages': len(times),
+            'ms_per_page': round(statistics.mean(times) * 1000, 3),
+            'p50_ms': round(statistics.median(times) * 1000, 3),
+            'max_ms': round(max(times) * 1000, 3),
+            'stages_ms': {},
+            'fields_ms': {},
+        }
+
+    for timing in metrics.as_dict()['timings']:
+        labels = timing['labels']
+        carrier = report[labels['carrier']]
+        total = timing['total'] * 1000
+        carrier['stages_ms'][timing['stage']] = round(
+            carrier['stages_ms'].get(timing['stage'], 0) + total, 3)
+        if 'field' in labels:
+            name = f'{labels["section"]}.{labels["field"]}'
+            carrier['fields_ms'][name] = round(carrier['fields_ms'].get(name, 0) + total, 3)
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parse-only benchmark over an HTTP archive')
+    parser.add_argument('archive', help='Archive file written by app.py --record')
+    parser.add_argument('--parser', help='Parser backend used for every carrier')
+    parser.add_argument('--repeat', type=int, default=1, help='Parse every page that many times')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    archive = HttpArchive(args.archive)
+    pages = archived_pages(archive)
+    archive.close()
+
+    report = run(pages, args.parser, args.repeat)
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    for carrier_id, carrier in report.items():
+        print(f'{carrier_id}: {carrier["pages"]} pages, {carrier["ms_per_page"]} ms/page, '
+              f'p50 {carrier["p50_ms"]} ms, max {carrier["max_ms"]} ms')
+        for stage, total in carrier['stages_ms'].items():
+            print(f'  {stage:<10} {total:>10.3f} ms')
+        for field, total in sorted(carrier['fields_ms'].items(), key=lambda item: -item[1]):
+            print(f'  {field:<30} {total:>10.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Startup benchmark, import and first-use cost of the carrier registry
+with N synthetic carriers of an external package found through entry points:
+
+    python -m bench.startup --carriers 10 100 500 [--repeat 5]
+
+Every synthetic carrier is a copy of carriers/placeholder_car.py. Each run is a
+fresh interpreter, reported times are medians in ms
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = 'bench_startup_carriers'
+
+MEASURE = '''
+import json, sys, time
+start = time.perf_counter()
+import carriers
+imported = time.perf_counter()
+config = carriers.get_carrier_conf(sys.argv[1])
+first = time.perf_counter()
+assert config is not None
+for carrier_id in carriers.CARRIER_MAPPING.ids():
+    carriers.CARRIER_MAPPING[carrier_id]
+every = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_carrier_ms': (first - imported) * 1000,
+    'all_carriers_ms': (every - imported) * 1000,
+}))
+'''
+
+
+def make_plugin(directory: str, carriers: int) -> None:
+    """
+    Package of synthetic carriers with its dist-info, as if pip installed it
+    """
+    with open(os.path.join(ROOT, 'carriers', 'placeholder_car.py')) as file:
+        source = re.sub(r'from \.(\w+) import', r'from carriers.\1 import', file.read())
+
+    package = os.path.join(directory, PACKAGE)
+    os.makedirs(package)
+    open(os.path.join(package, '__init__.py'), 'w').close()
+    for i in range(carriers):
+        with open(os.path.join(package, f'carrier_{i}.py'), 'w') as file:
+            file.write(source)
+
+    dist_info = os.path.join(directory, f'{PACKAGE}-1.0.dist-info')
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, 'METADATA'), 'w') as file:
+        file.write(f'Metadata-Version: 2.1\nName: {PACKAGE}\nVersion: 1.0\n')
+    with open(os.path.join(dist_info, 'entry_points.txt'), 'w') as file:
+        file.write('[scraper.carriers]\n')
+        for i in range(carriers):
+            file.write(f'SYNTHETIC_{i} = {PACKAGE}.carrier_{i}:config\n')
+
+
+def measure(directory: str, repeat: int) -> dict:
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([ROOT, directory])}
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', MEASURE, 'SYNTHETIC_0'],
+            env=env, cwd=directory, capture_output=True, text=True, check=True,
+        ).stdout
+        runs.append(json.loads(output))
+
+    return {name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Carrier registry startup benchmark')
+    parser.add_argument('--carriers', type=int, nargs='+', default=[10, 100],
+                        help='Numbers of synthetic carriers to measure')
+    parser.add_argument('--repeat', type=int, default=5, help='Interpreter runs per measurement')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for carriers in args.carriers:
+        with tempfile.TemporaryDirectory() as directory:
+            make_plugin(directory, carriers)
+            report[carriers] = measure(directory, args.repeat)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+        return
+
+    for carriers, times in report.items():
+        print(f'{carriers} carriers: import {times["import_ms"]} ms, '
+              f'first carrier {times["first_carrier_ms"]} ms, all carriers {times["all_carriers_ms"]} ms')
+
+
+if __name__ == '__main__':
+    main()
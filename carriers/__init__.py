@@ -1,16 +1,25 @@
+import sys
+
 from .models import ParserConfig
-from .mock_ind import config as mock_conf
-from .placeholder_car import config as placeholder_conf
+from .registry import CarrierRegistry
 
-CARRIER_MAPPING = {
-    'MOCK_INDEMNITY': mock_conf,
-    'PLACEHOLDER_CARRIER': placeholder_conf,
-}
+# carrier modules are imported on first use, see CarrierRegistry
+CARRIER_MAPPING = CarrierRegistry()
+CARRIER_MAPPING.register('MOCK_INDEMNITY', 'carriers.mock_ind:config')
+CARRIER_MAPPING.register('PLACEHOLDER_CARRIER', 'carriers.placeholder_car:config')
 
 
 def get_carrier_conf(carrier_id: str) -> ParserConfig | None:
     if carrier_id not in CARRIER_MAPPING:
-        print(f'Error: {carrier_id=} not found')
+        print(f'Error: {carrier_id=} not found', file=sys.stderr)
+        return None
+
+    if carrier_id in CARRIER_MAPPING.failed:
+        # reported when it failed
         return None
 
-    return CARRIER_MAPPING[carrier_id]
+    try:
+        return CARRIER_MAPPING[carrier_id]
+    except Exception as e:
+        print(f'Error: {carrier_id=} failed to load: {e}', file=sys.stderr)
+        return None
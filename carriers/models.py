@@ -1,9 +1,15 @@
 from dataclasses import dataclass, field
+from functools import cached_property
+
+from bs4 import SoupStrainer
 
 from scraper.selectors import BaseElementSelector
 from scraper.extractors import BaseValueExtractor
 from scraper.validators import BaseValidator
 from scraper.converters import BaseConverter
+from scraper.scope import build_parse_filter, build_stream_scope, StreamScope
+from scraper.plan import DataPlan
+from scraper.fingerprints import config_fingerprint
 
 
 @dataclass
@@ -21,6 +27,25 @@ class DataConfig:
     fields: list[FieldConfig]
     array: bool = False
     container_selector: BaseElementSelector | None = None
+    # subtree the section reads, set it when fields read outside
+    # of the container, defaults to container_selector
+    parse_scope: BaseElementSelector | None = None
+
+    @cached_property
+    def plan(self) -> DataPlan:
+        return DataPlan(self)
+
+
+@dataclass
+class RateLimitConfig:
+    # requests per second, rate adapts between min_rate and max_rate:
+    # +increase after every successful request, *decrease after a 429
+    rate: float = 10.0
+    min_rate: float = 0.5
+    max_rate: float = 100.0
+    increase: float = 1.0
+    decrease: float = 0.5
+    burst: int = 1
 
 
 @dataclass
@@ -29,3 +54,57 @@ class ParserConfig:
     multipage: bool
     data: list[DataConfig]
     start_page: int | None = None
+    # html parser backend name, see scraper.parsers.PARSER_BACKENDS
+    parser: str | None = None
+    # max number of in-flight extractors for this carrier host (async mode)
+    max_concurrency: int | None = None
+    rate_limit: RateLimitConfig = field(default_factory=RateLimitConfig)
+    # multipage only, > 1 fetches that many pages at once, the window
+    # then adapts to how many pages past the last one were fetched
+    prefetch_window: int = 1
+    max_prefetch_window: int = 8
+    # build only the subtrees the DataConfigs read
+    partial_parse: bool = True
+    # seconds to connect and between bytes read, None waits forever
+    connect_timeout: float | None = 10.0
+    read_timeout: float | None = 30.0
+    # seconds a task may run from its first request, then it's finished
+    # with error and the data scraped so far
+    task_timeout: float | None = None
+    # a request still unanswered after the p95 latency of the host
+    # is sent again, the first response is used
+    hedge_requests: bool = False
+    # stop downloading a page once the first element matching the scope
+    # of every section it needs has been closed, sections must read
+    # only inside the first of those elements
+    stream_pages: bool = False
+
+    @cached_property
+    def parse_filters(self) -> tuple[SoupStrainer | None, SoupStrainer | None]:
+        """
+        Parse filters for the first page and for the later ones,
+        later pages only need the array sections
+        """
+        return (
+            build_parse_filter(self.data),
+            build_parse_filter([data_conf for data_conf in self.data if data_conf.array]),
+        )
+
+    @cached_property
+    def stream_scopes(self) -> tuple[StreamScope | None, StreamScope | None]:
+        """
+        Stream scopes for the first page and for the later ones,
+        None reads the whole page
+        """
+        return (
+            build_stream_scope(self.data),
+            build_stream_scope([data_conf for data_conf in self.data if data_conf.array]),
+        )
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """
+        Hash of the sections and parser, pages stored in a PageStore
+        under another fingerprint are parsed again
+        """
+        return config_fingerprint(self)
@@ -8,6 +8,11 @@ from .models import FieldConfig, ParserConfig, DataConfig
 
 def hidden_tr_selector(html: BeautifulSoup) -> BeautifulSoup | None:
     _id = html.get('data-bs-target')
+    # hidden row follows its row, don't search the whole table for it
+    next_row = html.find_next_sibling('tr')
+    if next_row is not None and f"#{next_row.get('id')}" == _id:
+        return next_row
+
     parent_el = html.parent
     return parent_el.select_one(_id)
 
@@ -73,6 +78,8 @@ config = ParserConfig(
         DataConfig(
             name='policy',
             container_selector=CSSMultiSelector('.policy-info-row'),
+            # hidden_tr_selector reads the rows next to the container
+            parse_scope=CSSMultiSelector('table'),
             array=True,
             fields=[
                 FieldConfig(
@@ -0,0 +1,130 @@
+import importlib
+import threading
+
+from collections.abc import MutableMapping
+from typing import Iterator
+
+from .models import ParserConfig
+
+
+# entry point group of carriers from other packages, entry point name is
+# the carrier id, value the path of its ParserConfig:
+#   [project.entry-points."scraper.carriers"]
+#   ACME = "acme_carriers.acme:config"
+ENTRY_POINT_GROUP = 'scraper.carriers'
+
+
+def load_config(path: str) -> ParserConfig:
+    """
+    ParserConfig at 'package.module:attribute'
+    """
+    module_name, _, attribute = path.partition(':')
+    config = getattr(importlib.import_module(module_name), attribute or 'config')
+    if not isinstance(config, ParserConfig):
+        raise TypeError(f'{path} is not a ParserConfig')
+    return config
+
+
+def compile_config(config: ParserConfig) -> ParserConfig:
+    """
+    Builds the parse filters, stream scopes, fingerprint and data plans of config,
+    so the first page of the carrier doesn't pay for them
+    """
+    config.parse_filters
+    config.stream_scopes
+    config.fingerprint
+    for data_conf in config.data:
+        data_conf.plan
+    return config
+
+
+class CarrierRegistry(MutableMapping):
+    """
+    Carrier configs by id. Carriers are registered by the path of their
+    ParserConfig and imported on first use, so startup doesn't grow with
+    the number of carriers. Carriers of other packages are found through
+    the ENTRY_POINT_GROUP entry points the first time an unknown id is
+    looked up, registered carriers win over entry points of the same id.
+    Assigned configs replace registered ones. A carrier that fails to load
+    isn't imported again, later lookups raise its error until it's registered again
+    """
+    def __init__(self, group: str | None = ENTRY_POINT_GROUP):
+        self.group = group
+        # carrier id -> 'package.module:attribute'
+        self.paths: dict[str, str] = {}
+        self.configs: dict[str, ParserConfig] = {}
+        # carrier id -> error of its failed load
+        self.failed: dict[str, Exception] = {}
+        self._discovered = group is None
+        self._lock = threading.RLock()
+
+    def register(self, carrier_id: str, path: str) -> None:
+        with self._lock:
+            self.paths[carrier_id] = path
+            self.configs.pop(carrier_id, None)
+            self.failed.pop(carrier_id, None)
+
+    def discover(self) -> None:
+        with self._lock:
+            if self._discovered:
+                return
+            self._discovered = True
+            # slow to import, only needed when looking for an unknown carrier
+            from importlib.metadata import entry_points
+
+            for entry_point in entry_points(group=self.group):
+                self.paths.setdefault(entry_point.name, entry_point.value)
+
+    def _known(self, carrier_id: str) -> bool:
+        with self._lock:
+            if carrier_id in self.configs or carrier_id in self.paths:
+                return True
+            self.discover()
+            return carrier_id in self.paths
+
+    def __contains__(self, carrier_id) -> bool:
+        return self._known(carrier_id)
+
+    def __getitem__(self, carrier_id: str) -> ParserConfig:
+        with self._lock:
+            if carrier_id in self.configs:
+                return self.configs[carrier_id]
+            if carrier_id in self.failed:
+                raise self.failed[carrier_id]
+            if not self._known(carrier_id):
+                raise KeyError(carrier_id)
+
+            try:
+                config = compile_config(load_config(self.paths[carrier_id]))
+            except Exception as e:
+                self.failed[carrier_id] = e
+                raise
+            self.configs[carrier_id] = config
+            return config
+
+    def __setitem__(self, carrier_id: str, config: ParserConfig) -> None:
+        with self._lock:
+            self.configs[carrier_id] = config
+            self.failed.pop(carrier_id, None)
+
+    def __delitem__(self, carrier_id: str) -> None:
+        with self._lock:
+            if carrier_id not in self.configs and carrier_id not in self.paths:
+                raise KeyError(carrier_id)
+            self.configs.pop(carrier_id, None)
+            self.paths.pop(carrier_id, None)
+            self.failed.pop(carrier_id, None)
+
+    def ids(self) -> list[str]:
+        """
+        Every known carrier id, nothing is imported
+        """
+        self.discover()
+        with self._lock:
+            return list(dict.fromkeys([*self.paths, *self.configs]))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ids())
+
+    def __len__(self) -> int:
+        return len(self.ids())
@@ -0,0 +1,124 @@
+import json
+import sqlite3
+import threading
+import zlib
+import requests
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Iterator
+
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .clients import BaseHttpClient
+
+
+@dataclass
+class ArchivedResponse:
+    url: str
+    status_code: int
+    headers: dict
+    body: bytes
+
+    def to_response(self) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.body
+        return response
+
+
+class HttpArchive:
+    """
+    SQLite file of recorded responses in request order,
+    bodies are stored zlib compressed
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'id INTEGER PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB)'
+        )
+
+    def add(self, response: requests.Response, url: str) -> None:
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO responses (url, status, headers, body) VALUES (?, ?, ?, ?)',
+                (url, response.status_code, json.dumps(dict(response.headers)),
+                 zlib.compress(response.content)),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+
+    def __iter__(self) -> Iterator[ArchivedResponse]:
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT url, status, headers, body FROM responses ORDER BY id').fetchall()
+
+        for url, status, headers, body in rows:
+            yield ArchivedResponse(url, status, json.loads(headers), zlib.decompress(body))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RecordingClient(BaseHttpClient):
+    """
+    Saves every response of the wrapped client to an HttpArchive
+    """
+    def __init__(self, client: BaseHttpClient, archive: HttpArchive):
+        self.client = client
+        self.archive = archive
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        response = self.client.get(url, **kwargs)
+        self.archive.add(response, url)
+        with self._lock:
+            self.recorded += 1
+        return response
+
+    def summary(self) -> str:
+        return f'archive {self.archive.path}: recorded={self.recorded}'
+
+
+class ReplayClient(BaseHttpClient):
+    """
+    Serves responses from an HttpArchive without any network.
+    Responses of a url are replayed in recorded order, the last one is
+    repeated after that. Urls missing from the archive get a 404
+    """
+    def __init__(self, archive: HttpArchive):
+        self.archive = archive
+        self.responses: dict[str, list[ArchivedResponse]] = defaultdict(list)
+        for archived in archive:
+            self.responses[archived.url].append(archived)
+        self.replayed = 0
+        self.missing = 0
+        self._positions: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        with self._lock:
+            recorded = self.responses.get(url)
+            if not recorded:
+                self.missing += 1
+                return ArchivedResponse(url, 404, {}, b'').to_response()
+
+            position = self._positions[url]
+            self._positions[url] = min(position + 1, len(recorded) - 1)
+            self.replayed += 1
+
+        return recorded[position].to_response()
+
+    def summary(self) -> str:
+        return f'archive {self.archive.path}: replayed={self.replayed}, missing={self.missing}'
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import requests
+
+from dataclasses import dataclass
+
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .clients import BaseHttpClient
+
+
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    path: str
+    headers: dict
+    stored_at: float
+    size: int
+
+    @property
+    def etag(self) -> str | None:
+        return self.headers.get('ETag')
+
+    @property
+    def last_modified(self) -> str | None:
+        return self.headers.get('Last-Modified')
+
+    def read(self) -> bytes | None:
+        try:
+            with open(self.path, 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+
+class ResponseCache:
+    """
+    Response bodies stored on disk next to an SQLite index.
+    Entries are evicted least recently used first once their
+    total size exceeds max_bytes
+    """
+    def __init__(self, path: str, ttl: float = 3600, max_bytes: int = 500 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(path, 'index.sqlite'), check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            'url TEXT PRIMARY KEY, headers TEXT, stored_at REAL, last_access REAL, size INTEGER)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.path, hashlib.sha256(url.encode()).hexdigest() + '.body')
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.ttl
+
+    def get(self, url: str) -> CacheEntry | None:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT headers, stored_at, size FROM entries WHERE url = ?', (url,)).fetchone()
+            if not row:
+                return None
+
+            self._db.execute('UPDATE entries SET last_access = ? WHERE url = ?', (time.time(), url))
+
+        headers, stored_at, size = row
+        return CacheEntry(url, self._body_path(url), json.loads(headers), stored_at, size)
+
+    def put(self, url: str, response: requests.Response) -> None:
+        body = response.content
+        path = self._body_path(url)
+        headers = {k: response.headers[k] for k in CACHED_HEADERS if k in response.headers}
+
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as file:
+            file.write(body)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                (url, json.dumps(headers), now, now, len(body)),
+            )
+            self._evict()
+
+    def refresh(self, url: str) -> None:
+        """
+        Entry revalidated by the server, restart its ttl
+        """
+        with self._lock:
+            self._db.execute('UPDATE entries SET stored_at = ? WHERE url = ?', (time.time(), url))
+
+    def _evict(self) -> None:
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute('SELECT url, size FROM entries ORDER BY last_access').fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM entries WHERE url = ?', (url,))
+            try:
+                os.remove(self._body_path(url))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class CachingClient(BaseHttpClient):
+    """
+    Serves fresh entries from ResponseCache without a request,
+    stale ones are revalidated with a conditional GET
+    """
+    def __init__(self, client: BaseHttpClient, cache: ResponseCache):
+        self.client = client
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @staticmethod
+    def _make_response(url: str, entry: CacheEntry, body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry.headers)
+        # decoded like the live response, not by charset detection
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        entry = self.cache.get(url)
+        body = entry.read() if entry else None
+        if body is None:
+            entry = None
+
+        if entry and self.cache.is_fresh(entry):
+            self._count('hits')
+            return self._make_response(url, entry, body)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.client.get(url, headers=headers, **kwargs)
+
+        if entry and response.status_code == 304:
+            self._count('revalidated')
+            self.cache.refresh(url)
+            return self._make_response(url, entry, body)
+
+        self._count('misses')
+        # a streamed page read only up to its sections isn't the whole page
+        if response.status_code == 200 and not getattr(response, 'truncated', False):
+            self.cache.put(url, response)
+
+        return response
+
+    def summary(self) -> str:
+        return f'cache: hits={self.hits}, misses={self.misses}, revalidated={self.revalidated}'
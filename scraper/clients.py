@@ -0,0 +1,348 @@
+import codecs
+import threading
+import time
+import requests
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict
+from urllib.parse import urlparse
+
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .scope import StreamScope
+
+
+class BaseHttpClient(ABC):
+    """
+    Abstract base class for http clients used by Extractor
+    """
+    @abstractmethod
+    def get(self, url: str, **kwargs) -> requests.Response:
+        pass
+
+
+def _release(response: requests.Response, drain_limit: int) -> None:
+    """
+    Reads and drops the rest of an unfinished body when it's at most
+    drain_limit bytes, so its keep-alive connection goes back to the pool.
+    A longer rest costs more than a new connection, the connection is closed
+    """
+    raw = response.raw
+    length = response.headers.get('Content-Length')
+    left = int(length) - raw.tell() if length and length.isdigit() else None
+    if left is None or left <= drain_limit:
+        drained = 0
+        while drained <= drain_limit:
+            data = raw.read(16384, decode_content=False)
+            if not data:
+                # whole body read, close() only releases the connection
+                response._content_consumed = True
+                break
+            drained += len(data)
+
+    response.close()
+
+
+def read_streamed(
+    response: requests.Response,
+    scope: StreamScope,
+    chunk_size: int = 16384,
+    drain_limit: int = 65536,
+) -> requests.Response:
+    """
+    Reads a streamed 200 body until scope has seen every section, the rest
+    isn't parsed. Up to drain_limit bytes of it are still read to keep the
+    connection, a longer rest isn't downloaded and the connection is closed.
+    response.truncated tells if reading stopped early
+    """
+    response.truncated = False
+    if response.status_code != 200:
+        response.content
+        return response
+
+    scanner = scope.scanner()
+    # only tags are looked at, a wrong guess of the charset doesn't matter
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    chunks = []
+    # compressed bodies are decoded as they arrive
+    for chunk in response.iter_content(chunk_size):
+        chunks.append(chunk)
+        scanner.feed(decoder.decode(chunk))
+        if scanner.done:
+            response.truncated = True
+            break
+
+    if response.truncated:
+        _release(response, drain_limit)
+    else:
+        response.close()
+    response._content = b''.join(chunks)
+    response._content_consumed = True
+    return response
+
+
+class DefaultClient(BaseHttpClient):
+    """
+    Plain requests.get, a new connection for every request.
+    With a read_until scope the body is streamed, see read_streamed()
+    """
+    def get(self, url: str, read_until: StreamScope | None = None, **kwargs) -> requests.Response:
+        if read_until is None:
+            return requests.get(url, **kwargs)
+        return read_streamed(requests.get(url, stream=True, **kwargs), read_until)
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    new_connections: int = 0
+    wait_time: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def reused(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def add(self, requests: int = 0, new_connections: int = 0, wait_time: float = 0.0) -> None:
+        with self._lock:
+            self.requests += requests
+            self.new_connections += new_connections
+            self.wait_time += wait_time
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data.pop('_lock')
+        data['reused'] = self.reused
+        return data
+
+
+class _StatsPoolMixin:
+    """
+    Counts new connections and time spent waiting for a free one
+    """
+    stats: PoolStats
+
+    def _new_conn(self):
+        self.stats.add(new_connections=1)
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super()._get_conn(timeout)
+        finally:
+            self.stats.add(wait_time=time.perf_counter() - start)
+
+
+class _StatsAdapter(HTTPAdapter):
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {'stats': self.stats}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('HTTPConnectionPool', (_StatsPoolMixin, HTTPConnectionPool), attrs),
+            'https': type('HTTPSConnectionPool', (_StatsPoolMixin, HTTPSConnectionPool), attrs),
+        }
+
+    def send(self, request, **kwargs) -> requests.Response:
+        self.stats.add(requests=1)
+        return super().send(request, **kwargs)
+
+
+class SessionPool(BaseHttpClient):
+    """
+    One keep-alive requests.Session per host, shared by all extractors
+    of that host. When all pool_size connections are busy callers wait
+    for a free one instead of opening a new connection.
+    With a read_until scope the body is streamed, see read_streamed()
+    """
+    def __init__(self, pool_size: int = 10):
+        self.pool_size = pool_size
+        self.sessions: dict[str, requests.Session] = {}
+        self.stats: dict[str, PoolStats] = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self, host: str) -> requests.Session:
+        with self._lock:
+            if host not in self.sessions:
+                self.stats[host] = PoolStats()
+                adapter = _StatsAdapter(
+                    self.stats[host],
+                    pool_connections=1,
+                    pool_maxsize=self.pool_size,
+                    pool_block=True,
+                )
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+
+            return self.sessions[host]
+
+    def get(self, url: str, read_until: StreamScope | None = None, **kwargs) -> requests.Response:
+        session = self._get_session(urlparse(url).netloc)
+        if read_until is None:
+            return session.get(url, **kwargs)
+        # a body left unread closes its connection instead of returning it to the pool
+        return read_streamed(session.get(url, stream=True, **kwargs), read_until)
+
+    def summary(self) -> str:
+        lines = []
+        for host, stats in self.stats.items():
+            lines.append(
+                f'pool {host}: requests={stats.requests}, new connections={stats.new_connections}, '
+                f'reused={stats.reused}, wait time={stats.wait_time:.3f}s'
+            )
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        for session in self.sessions.values():
+            session.close()
+
+
+class CoalescingClient(BaseHttpClient):
+    """
+    Concurrent requests for the same url and options share one
+    in-flight request, every caller gets its response. Callers joining
+    a request wait for it under the timeout of the first caller
+    """
+    def __init__(self, client: BaseHttpClient):
+        self.client = client
+        # (url, options) -> response of the in-flight request
+        self.inflight: dict[tuple, Future] = {}
+        self.coalesced = 0
+        self._lock = threading.Lock()
+
+    # options of how a request is sent, not of what it returns: tasks with
+    # different time left share the request of the first one
+    transport_options = ('timeout',)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        try:
+            # requests with the same options are shared
+            key = (url, tuple(sorted(
+                (name, value) for name, value in kwargs.items() if name not in self.transport_options)))
+            hash(key)
+        except TypeError:
+            return self.client.get(url, **kwargs)
+
+        with self._lock:
+            future = self.inflight.get(key)
+            if future:
+                self.coalesced += 1
+            else:
+                self.inflight[key] = Future()
+
+        if future:
+            return future.result()
+
+        future = self.inflight[key]
+        try:
+            response = self.client.get(url, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self.inflight[key]
+
+    def summary(self) -> str:
+        return f'coalesced requests: {self.coalesced}'
+
+
+class HedgingClient(BaseHttpClient):
+    """
+    For hosts configured with hedging, a request not answered after the
+    quantile latency of the last window requests of its host is sent again,
+    the first response is returned. Hosts hedge only after min_samples
+    requests, the slower request is left to finish on its own
+    """
+    def __init__(
+        self,
+        client: BaseHttpClient,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        max_workers: int = 64,
+    ):
+        self.client = client
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.hosts: set[str] = set()
+        # host -> latencies of recent successful requests
+        self.latencies: dict[str, deque] = {}
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def configure(self, host: str, enabled: bool) -> None:
+        with self._lock:
+            if enabled:
+                self.hosts.add(host)
+            else:
+                self.hosts.discard(host)
+
+    def hedge_delay(self, host: str) -> float | None:
+        with self._lock:
+            latencies = sorted(self.latencies.get(host, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[int(self.quantile * (len(latencies) - 1))]
+
+    def _get(self, host: str, url: str, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = self.client.get(url, **kwargs)
+        with self._lock:
+            self.latencies.setdefault(host, deque(maxlen=self.window)).append(
+                time.perf_counter() - start)
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            return self.client.get(url, **kwargs)
+
+        delay = self.hedge_delay(host)
+        if delay is None:
+            return self._get(host, url, **kwargs)
+
+        primary = self._executor.submit(self._get, host, url, **kwargs)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge = self._executor.submit(self._get, host, url, **kwargs)
+        with self._lock:
+            self.hedged += 1
+
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+
+        # both failed
+        return primary.result()
+
+    def summary(self) -> str:
+        if not self.hosts:
+            return ''
+        return f'hedged requests: {self.hedged}, answered first: {self.hedge_wins}'
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,3 +1,6 @@
+import datetime
+
+from decimal import Decimal, InvalidOperation
 from typing import Any
 from abc import ABC, abstractmethod
 
@@ -9,3 +12,111 @@ class BaseConverter(ABC):
     @abstractmethod
     def convert(self, value: str) -> Any:
         pass
+
+    def convert_many(self, values: list[str | None]) -> list[Any]:
+        """
+        Converts one column of values of an array section,
+        same results as calling convert for each of them
+        """
+        return [self.convert(value) for value in values]
+
+
+class MemoizedConverter(BaseConverter):
+    """
+    Converter that parses every distinct value once, columns of policy
+    rows repeat the same dates and amounts. Converted values are shared
+    between rows, so they must be immutable.
+    The memo is dropped when it holds max_size values
+    """
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._memo: dict[str | None, Any] = {}
+
+    @abstractmethod
+    def parse(self, value: str) -> Any:
+        """
+        Converted value of a stripped, non-empty value
+        """
+        pass
+
+    def _convert(self, value: str | None) -> Any:
+        text = value.strip() if value else None
+        result = self.parse(text) if text else None
+        if len(self._memo) >= self.max_size:
+            self._memo = {}
+        self._memo[value] = result
+        return result
+
+    def convert(self, value: str | None) -> Any:
+        try:
+            return self._memo[value]
+        except KeyError:
+            return self._convert(value)
+
+    def convert_many(self, values: list[str | None]) -> list[Any]:
+        memo = self._memo
+        results = []
+        for value in values:
+            try:
+                results.append(memo[value])
+            except KeyError:
+                results.append(self._convert(value))
+                memo = self._memo
+        return results
+
+
+class DateConverter(MemoizedConverter):
+    """
+    datetime.date of the first of formats (strptime) the value matches,
+    None for empty values and values matching none of them
+    """
+    def __init__(self, formats: str | tuple[str, ...] = '%m/%d/%Y', max_size: int = 4096):
+        super().__init__(max_size)
+        self.formats = (formats,) if isinstance(formats, str) else tuple(formats)
+
+    def parse(self, value: str) -> datetime.date | None:
+        for date_format in self.formats:
+            try:
+                return datetime.datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        return None
+
+
+class DecimalConverter(MemoizedConverter):
+    """
+    Decimal of an amount like '$1,234.50', characters of strip are removed
+    first and '(1.00)' is negative. None for empty and invalid values
+    """
+    def __init__(self, strip: str = '$€£, ', max_size: int = 4096):
+        super().__init__(max_size)
+        self.strip = strip
+        self._table = str.maketrans('', '', strip)
+
+    def parse(self, value: str) -> Decimal | None:
+        negative = value.startswith('(') and value.endswith(')')
+        if negative:
+            value = value[1:-1]
+        try:
+            number = Decimal(value.translate(self._table))
+        except InvalidOperation:
+            return None
+        if not number.is_finite():
+            return None
+        return -number if negative else number
+
+
+class PercentConverter(DecimalConverter):
+    """
+    Decimal of a percentage like '12.5%', Decimal('12.5')
+    or Decimal('0.125') with fraction=True
+    """
+    def __init__(self, fraction: bool = False, strip: str = '%, ', max_size: int = 4096):
+        super().__init__(strip, max_size)
+        self.fraction = fraction
+
+    def parse(self, value: str) -> Decimal | None:
+        number = super().parse(value)
+        if number is not None and self.fraction:
+            number = number.scaleb(-2)
+        return number
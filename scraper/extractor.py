@@ -1,11 +1,21 @@
 import requests
+import time
+import sys
 
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from typing import NoReturn, Any
 from bs4 import BeautifulSoup
 
 from carriers.models import ParserConfig, FieldConfig, DataConfig
 
-from .models import ResultStatus, ResultModel
+from .models import ResultStatus, ResultModel, PageData, ChunkModel
+from .clients import BaseHttpClient, DefaultClient
+from .prefetch import PrefetchWindow
+from .parsers import get_parser_backend
+from .journal import Journal, task_key
+from .metrics import Metrics
+from .fingerprints import PageStore
 
 
 class Extractor:
@@ -14,8 +24,19 @@ class Extractor:
         task: dict,
         config: ParserConfig,
         tries_limit: int = 10,
+        client: BaseHttpClient | None = None,
+        prefetch: PrefetchWindow | None = None,
+        journal: Journal | None = None,
+        metrics: Metrics | None = None,
+        page_store: PageStore | None = None,
+        priority: int = 0,
+        deadline: float | None = None,
+        chunk_arrays: bool = False,
     ):
         self.config: ParserConfig = config
+        self.client = client or DefaultClient()
+        self.prefetch = prefetch or PrefetchWindow(
+            config.prefetch_window, config.max_prefetch_window)
         self.tries = 0
         self.tries_limit = tries_limit
         self.errors = []
@@ -28,6 +49,28 @@ class Extractor:
         self.current_url = self.build_url(
             config.url_template, page=self.config.start_page, **self.arguments)
         self.current_page = config.start_page
+        self.key = task_key(self.carrier_id, self.arguments)
+        self.journal = journal
+        # time.monotonic() of the first fetch
+        self.started_at: float | None = None
+        self.metrics = metrics.bind(carrier=self.carrier_id) if metrics else None
+        self.page_store = page_store
+        self.parsed_pages = 0
+        self.reused_pages = 0
+        # scheduling, higher priority first, then earlier deadline (unix time)
+        self.priority = priority
+        self.deadline = deadline
+        # queue order, set by the Scheduler when the task is first queued
+        self.sequence: int | None = None
+        # array sections go to ChunkModels instead of data,
+        # chunks holds the ones not taken by the worker yet
+        self.chunk_arrays = chunk_arrays
+        self.chunks: list[ChunkModel] = []
+        self.chunk_count = 0
+
+    @property
+    def host(self) -> str:
+        return urlparse(self.config.url_template).netloc
 
     @staticmethod
     def build_url(url_template: str, **kwargs) -> str:
@@ -40,6 +83,9 @@ class Extractor:
         return url_template
 
     def _make_result(self) -> ResultModel:
+        if self.metrics and self.status != ResultStatus.pending.value and self.started_at is not None:
+            self.metrics.add_time('task', time.monotonic() - self.started_at, status=self.status)
+
         return ResultModel(
             status=self.status,
             carrier=self.carrier_id,
@@ -47,21 +93,144 @@ class Extractor:
             urls=self.parsed_urls,
             errors=self.errors,
             data=self.data,
+            reused=self.reused_pages > 0 and self.parsed_pages == 0,
+            chunks=self.chunk_count if self.chunk_arrays else None,
         )
 
-    @staticmethod
-    def _get_request(url: str) -> requests.Response | NoReturn:
-        response = requests.get(url)
-        print(f'request {url=}, response code={response.status_code}')
+    @property
+    def time_left(self) -> float | None:
+        """
+        Seconds left of config.task_timeout, None without a timeout
+        """
+        if self.config.task_timeout is None or self.started_at is None:
+            return None
+        return self.config.task_timeout - (time.monotonic() - self.started_at)
+
+    @property
+    def timed_out(self) -> bool:
+        return self.time_left is not None and self.time_left <= 0
+
+    def fail_timeout(self) -> ResultModel:
+        return self.fail(f'Task timeout: not finished in {self.config.task_timeout}s')
+
+    def fail(self, error: str) -> ResultModel:
+        """
+        Finishes task with error, keeps data scraped so far
+        """
+        self.errors.append(error)
+        self.status = ResultStatus.error.value
+        return self._make_result()
+
+    def _get_request(self, url: str, first_page: bool = True) -> requests.Response | NoReturn:
+        if self.metrics:
+            start = time.perf_counter()
+
+        options = {'timeout': self._request_timeout()}
+        scope = self.config.stream_scopes[0 if first_page else 1] if self.config.stream_pages else None
+        if scope:
+            options['read_until'] = scope
+        response = self.client.get(url, **options)
+        print(f'request {url=}, response code={response.status_code}', file=sys.stderr)
+
+        if self.metrics:
+            self.metrics.add_time('fetch', time.perf_counter() - start)
+            self.metrics.count('requests', status=response.status_code)
+            self.metrics.count('response_bytes', len(response.content))
+            if response.status_code == 429:
+                self.metrics.count('throttled')
+            if getattr(response, 'truncated', False):
+                self.metrics.count('truncated_pages')
         # TODO other http errors handling
-        if response.status_code == 429:
-            raise requests.HTTPError('429')
+        if response.status_code == 429 or response.status_code >= 500:
+            # transient, the page is fetched again instead of being scraped
+            raise requests.HTTPError(str(response.status_code), response=response)
 
         return response
 
+    def _request_timeout(self) -> tuple[float | None, float | None]:
+        """
+        (connect, read) timeouts of a request, cut to the time left of the task
+        """
+        connect, read = self.config.connect_timeout, self.config.read_timeout
+        time_left = self.time_left
+        if time_left is not None:
+            time_left = max(time_left, 0.001)
+            connect = time_left if connect is None else min(connect, time_left)
+            read = time_left if read is None else min(read, time_left)
+        return connect, read
+
+    @property
+    def prefetch_enabled(self) -> bool:
+        return self.config.multipage and self.config.prefetch_window > 1
+
     def run(self) -> ResultModel:
         # Handle pagination and can scrape multiple pages
-        response = self._get_request(self.current_url)
+        return self.process(self.fetch())
+
+    def fetch(self) -> list[requests.Response | Exception]:
+        """
+        Fetches the current page, or the next prefetch.size pages concurrently.
+        A failed request ends the list with its exception,
+        process() raises it after the pages before it are merged.
+        Raises requests.Timeout once the task timeout is over
+        """
+        if self.started_at is None:
+            self.started_at = time.monotonic()
+        if self.timed_out:
+            # ran out of time waiting for a retry, the worker fails the task
+            raise requests.Timeout('task timeout')
+
+        if not self.prefetch_enabled:
+            return [self._get_request(self.current_url, self.current_page == self.config.start_page)]
+
+        pages = range(self.current_page, self.current_page + self.prefetch.size)
+        responses = []
+
+        with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+            futures = [
+                executor.submit(
+                    self._get_request,
+                    self.build_url(self.config.url_template, page=page, **self.arguments),
+                    page == self.config.start_page,
+                )
+                for page in pages
+            ]
+            for future in futures:
+                try:
+                    responses.append(future.result())
+                except Exception as e:
+                    responses.append(e)
+                    break
+
+        return responses
+
+    def process(
+        self,
+        responses: list[requests.Response | Exception],
+        pages: list[PageData | None] | None = None,
+    ) -> ResultModel:
+        """
+        Merges fetched pages in page order, pages past the first 404 are discarded.
+        pages holds already parsed responses, others are parsed here
+        """
+        for i, response in enumerate(responses):
+            if isinstance(response, Exception):
+                raise response
+
+            self._handle_response(response, pages[i] if pages else None)
+            if self.status != ResultStatus.pending.value:
+                if self.prefetch_enabled and self.status == ResultStatus.done.value:
+                    self.prefetch.update(len(responses) - i - 1)
+                return self._make_result()
+
+        if self.prefetch_enabled:
+            self.prefetch.update(None)
+
+        if self.timed_out:
+            return self.fail_timeout()
+        return self._make_result()
+
+    def _handle_response(self, response: requests.Response, page: PageData | None = None) -> None:
         self.parsed_urls.append(self.current_url)
 
         if (self.config.multipage
@@ -71,17 +240,33 @@ class Extractor:
             # remove current url from list of parsed urls
             self.parsed_urls.pop()
             self.status = ResultStatus.done.value
-            return self._make_result()
+            return
 
         elif response.status_code != 200:
             if self.tries >= self.tries_limit:
                 self.errors.append(f'url: error {response.status_code}')
                 self.status = ResultStatus.error.value
-                return self._make_result()
+                return
             else:
                 self.tries += 1
 
-        self._scrape_html(response.text)
+        first_page = self.current_page == self.config.start_page
+        if page is None and self.page_store:
+            page = self.page_store.get(self.current_url, response.content, first_page, self.config.fingerprint)
+        if page is None:
+            page = self._scrape_html(response.text)
+
+        if page.reused:
+            self.reused_pages += 1
+            if self.metrics:
+                self.metrics.count('reused_pages')
+        else:
+            self.parsed_pages += 1
+            if self.page_store:
+                self.page_store.put(self.current_url, response.content, first_page, self.config.fingerprint, page)
+        self._merge_page(page, self.current_page, self.current_url)
+        if self.journal:
+            self.journal.record_page(self.key, self.current_page, self.current_url, page)
 
         if self.config.multipage:
             # last page not reached yet
@@ -91,61 +276,208 @@ class Extractor:
         else:
             self.status = ResultStatus.done.value
 
-        return self._make_result()
+    def stored_pages(self, responses: list[requests.Response | Exception]) -> list[PageData | None]:
+        """
+        Pages of fetch() responses unchanged since they were stored,
+        None for the others
+        """
+        pages = []
+        for i, response in enumerate(responses):
+            if not self.page_store or isinstance(response, Exception) or response.status_code != 200:
+                pages.append(None)
+                continue
 
-    def _scrape_html(self, html_text: str) -> None:
-        html = BeautifulSoup(html_text, 'html.parser')
+            url = self.current_url if i == 0 else self.build_url(
+                self.config.url_template, page=self.current_page + i, **self.arguments)
+            first_page = i == 0 and self.current_page == self.config.start_page
+            pages.append(self.page_store.get(url, response.content, first_page, self.config.fingerprint))
 
-        for data_conf in self.config.data:
-            if data_conf.array:
-                self._scrape_array_fields(data_conf, html)
+        return pages
+
+    def restore(self, pages: list[tuple[int | None, str, PageData]]) -> None:
+        """
+        Continues a multipage task after the pages recorded in the journal
+        """
+        for page_number, url, page in pages:
+            self._merge_page(page, page_number, url)
+            self.parsed_urls.append(url)
+            if page_number is not None:
+                self.current_page = page_number + 1
+
+        self.current_url = self.build_url(
+            self.config.url_template, page=self.current_page, **self.arguments)
+
+    def _merge_page(self, page: PageData, page_number: int | None, url: str) -> None:
+        rows = {}
+        for name, value in page.data.items():
+            if isinstance(value, list):
+                if self.chunk_arrays:
+                    rows[name] = value
+                else:
+                    self.data.setdefault(name, []).extend(value)
             else:
-                self._scrape_fields(data_conf, html)
+                self.data[name] = value
 
-    def _scrape_fields(self, data_conf: DataConfig, html: BeautifulSoup) -> None:
-        if self.current_page != self.config.start_page:
-            # to not scrape the same date again
-            return
+        if rows:
+            self.chunks.append(ChunkModel(
+                carrier=self.carrier_id,
+                arguments=self.arguments,
+                chunk=self.chunk_count,
+                page=page_number,
+                url=url,
+                data=rows,
+            ))
+            self.chunk_count += 1
+        self.errors.extend(page.errors)
+
+    def take_chunks(self) -> list[ChunkModel]:
+        """
+        Chunks scraped since the last call
+        """
+        chunks, self.chunks = self.chunks, []
+        return chunks
 
-        self.data[data_conf.name] = {}
+    def _scrape_html(self, html_text: str) -> PageData:
+        return self.scrape_page(
+            self.config, html_text, self.current_page == self.config.start_page, self.metrics)
+
+    @classmethod
+    def scrape_page(
+        cls,
+        config: ParserConfig,
+        html_text: str,
+        first_page: bool,
+        metrics: Metrics | None = None,
+    ) -> PageData:
+        """
+        Runs every DataConfig of config over one page.
+        Non-array sections are only scraped from the first page
+        """
+        page = PageData()
+        parse_only = config.parse_filters[0 if first_page else 1] if config.partial_parse else None
 
+        if metrics:
+            start = time.perf_counter()
+        html = get_parser_backend(config.parser).parse(html_text, parse_only)
+        if metrics:
+            metrics.add_time('parse', time.perf_counter() - start)
+
+        for data_conf in config.data:
+            section_metrics = metrics.bind(section=data_conf.name) if metrics else None
+            if data_conf.array:
+                cls._scrape_array_fields(data_conf, html, page, section_metrics)
+            elif first_page:
+                cls._scrape_fields(data_conf, html, page, section_metrics)
+
+        return page
+
+    @classmethod
+    def _scrape_fields(
+        cls,
+        data_conf: DataConfig,
+        html: BeautifulSoup,
+        page: PageData,
+        metrics: Metrics | None = None,
+    ) -> None:
         if data_conf.container_selector:
             html = data_conf.container_selector.select(html)
 
-        for field_conf in data_conf.fields:
-            err, data = self._scrape_field(html, field_conf)
-            if err:
-                self.errors.append({f'{data_conf.name}.{field_conf.name}': err})
+        page.data[data_conf.name] = cls._scrape_item(data_conf, html, page, metrics)
 
-            self.data[data_conf.name][field_conf.name] = data
-
-    def _scrape_array_fields(self, data_conf: DataConfig, html: BeautifulSoup) -> None:
-        self.data[data_conf.name] = self.data.get(data_conf.name, [])
+    @classmethod
+    def _scrape_array_fields(
+        cls,
+        data_conf: DataConfig,
+        html: BeautifulSoup,
+        page: PageData,
+        metrics: Metrics | None = None,
+    ) -> None:
+        page.data[data_conf.name] = []
 
+        if metrics:
+            start = time.perf_counter()
         if data_conf.container_selector:
             html = data_conf.container_selector.select(html)
+        if metrics:
+            metrics.add_time('container', time.perf_counter() - start)
+
+        rows = [data_conf.plan.extract(item, metrics) for item in html or []]
+        if not rows:
+            return
+
+        # every field is validated and converted one column at a time
+        columns = []
+        for field_conf, values in zip(data_conf.fields, zip(*rows)):
+            columns.append(cls._scrape_column(list(values), field_conf, metrics))
 
-        for item in html:
+        for i in range(len(rows)):
             data = {}
-            for field_conf in data_conf.fields:
-                err, value = self._scrape_field(item, field_conf)
+            for field_conf, (errors, converted) in zip(data_conf.fields, columns):
+                data[field_conf.name] = converted[i]
+                err = [column_errors[i] for column_errors in errors if column_errors[i]]
                 if err:
-                    self.errors.append({f'{data_conf.name}.{field_conf.name}': err})
+                    page.errors.append({f'{data_conf.name}.{field_conf.name}': err})
+            page.data[data_conf.name].append(data)
 
-                data[field_conf.name] = value
+    @classmethod
+    def _scrape_item(
+        cls,
+        data_conf: DataConfig,
+        html: BeautifulSoup,
+        page: PageData,
+        metrics: Metrics | None = None,
+    ) -> dict:
+        data = {}
+        values = data_conf.plan.extract(html, metrics)
 
-            self.data[data_conf.name].append(data)
+        for field_conf, value in zip(data_conf.fields, values):
+            err, data[field_conf.name] = cls._scrape_field(value, field_conf, metrics)
+            if err:
+                page.errors.append({f'{data_conf.name}.{field_conf.name}': err})
+
+        return data
 
     @staticmethod
-    def _scrape_field(html: BeautifulSoup, field_config: FieldConfig) -> (list[str], Any):
+    def _scrape_field(
+        value: str | None,
+        field_config: FieldConfig,
+        metrics: Metrics | None = None,
+    ) -> (list[str], Any):
+        if metrics:
+            start = time.perf_counter()
         errors = []
-        element = field_config.selector.select(html) if field_config.selector else html
-        data = field_config.extractor.extract(element)
         for validator in field_config.validators:
-            err = validator.validate(data)
+            err = validator.validate(value)
             if err:
                 errors.append(err)
+        if metrics:
+            metrics.add_time('validate', time.perf_counter() - start, field=field_config.name)
+            start = time.perf_counter()
+
+        converted_data = field_config.converter.convert(value) if field_config.converter else value
+        if metrics:
+            metrics.add_time('convert', time.perf_counter() - start, field=field_config.name)
+
+        return errors, converted_data
+
+    @staticmethod
+    def _scrape_column(
+        values: list,
+        field_config: FieldConfig,
+        metrics: Metrics | None = None,
+    ) -> (list[list], list):
+        """
+        _scrape_field for a column of values, errors are one list per validator
+        """
+        if metrics:
+            start = time.perf_counter()
+        errors = [validator.validate_many(values) for validator in field_config.validators]
+        if metrics:
+            metrics.add_time('validate', time.perf_counter() - start, field=field_config.name)
+            start = time.perf_counter()
 
-        converted_data = field_config.converter.convert(data) if field_config.converter else data
+        converted_data = field_config.converter.convert_many(values) if field_config.converter else values
+        if metrics:
+            metrics.add_time('convert', time.perf_counter() - start, field=field_config.name)
 
         return errors, converted_data
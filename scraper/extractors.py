@@ -8,31 +8,49 @@ class BaseValueExtractor(ABC):
     """
     Abstract base class for value extractors
     """
+    # extractors working on serialized html set this and override
+    # extract_markup, so an element serialized once serves all of them
+    needs_markup = False
+
     @abstractmethod
     def extract(self, element: BeautifulSoup) -> str | None:
         pass
 
+    def extract_markup(self, markup: str) -> str | None:
+        """
+        Value of a serialized element, parsed again and passed to extract
+        """
+        return self.extract(BeautifulSoup(markup, 'html.parser').find(recursive=False))
+
 
 class HTMLValueExtractor(BaseValueExtractor):
     """
     Extracts data using CSS selectors
     """
     def extract(self, html: BeautifulSoup) -> str | None:
-        return html.string if html else None
+        string = html.string if html else None
+        # plain str, NavigableString keeps the whole parsed page alive
+        return str(string) if string is not None else None
 
 
 class RegexExtractor(BaseValueExtractor):
     """
     Extracts data using regex patterns
     """
+    needs_markup = True
+
     def __init__(self, regex: str):
         self.regex = regex
+        self.pattern = re.compile(regex)
 
     def extract(self, html: BeautifulSoup) -> str | None:
         if not html:
             return None
 
-        match = re.search(self.regex, str(html))
+        return self.extract_markup(str(html))
+
+    def extract_markup(self, markup: str) -> str | None:
+        match = self.pattern.search(markup)
         if match:
             return match.group(0)
 
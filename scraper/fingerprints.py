@@ -0,0 +1,126 @@
+import dataclasses
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import types
+
+from enum import Enum
+from typing import Any
+
+from .models import PageData, json_default
+
+
+# ParserConfig fields the scraped data of a page depends on
+EXTRACTION_FIELDS = ('data', 'parser', 'partial_parse')
+
+
+def _describe_code(code: types.CodeType) -> list:
+    return [
+        hashlib.sha256(code.co_code).hexdigest(),
+        list(code.co_names),
+        [_describe_code(const) if isinstance(const, types.CodeType) else repr(const) for const in code.co_consts],
+    ]
+
+
+def _describe(value: Any) -> Any:
+    """
+    JSON-able description of a config value that is the same in every
+    process: dataclass fields, public attributes of other objects (private
+    ones are caches) and the code of functions
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_describe(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(json.dumps(_describe(item)) for item in value)
+    if isinstance(value, dict):
+        return {str(key): _describe(item) for key, item in value.items()}
+    if isinstance(value, Enum):
+        return _describe(value.value)
+    if isinstance(value, re.Pattern):
+        return [value.pattern, value.flags]
+    if isinstance(value, types.MethodType):
+        return [_describe(value.__self__), _describe(value.__func__)]
+    if isinstance(value, types.FunctionType):
+        return [value.__module__, value.__qualname__, _describe_code(value.__code__)]
+
+    name = f'{type(value).__module__}.{type(value).__qualname__}'
+    if dataclasses.is_dataclass(value):
+        attributes = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    elif hasattr(value, '__dict__'):
+        attributes = {key: item for key, item in vars(value).items() if not key.startswith('_')}
+    else:
+        return [name, repr(value)]
+    return [name, {key: _describe(item) for key, item in sorted(attributes.items())}]
+
+
+def config_fingerprint(config) -> str:
+    """
+    Hash of what the scraped data of a page depends on in config
+    (carriers.models.ParserConfig): sections, fields, their selectors,
+    extractors, validators and converters, and the parser
+    """
+    description = {name: _describe(getattr(config, name)) for name in EXTRACTION_FIELDS}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class PageStore:
+    """
+    Content hash and scraped data of every page by url, an unchanged page
+    is reused without parsing it. Pages are stored with the
+    config_fingerprint of their carrier, a page stored before a change of
+    the carrier config is parsed again. With refresh stored pages are
+    never reused, only overwritten
+    """
+    def __init__(self, path: str, refresh: bool = False):
+        self.path = path
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT, first_page INTEGER, hash TEXT, data TEXT, errors TEXT, '
+            'config TEXT, PRIMARY KEY (url, first_page))'
+        )
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(pages)')]
+        if 'config' not in columns:
+            # stores of older versions, their pages are parsed again
+            self._db.execute('ALTER TABLE pages ADD COLUMN config TEXT')
+
+    @staticmethod
+    def fingerprint(body: bytes) -> str:
+        return hashlib.sha256(body).hexdigest()
+
+    def get(self, url: str, body: bytes, first_page: bool, config: str) -> PageData | None:
+        """
+        Stored page of url if body and the carrier config (config_fingerprint)
+        didn't change since
+        """
+        if self.refresh:
+            return None
+
+        with self._lock:
+            row = self._db.execute(
+                'SELECT hash, data, errors, config FROM pages WHERE url = ? AND first_page = ?',
+                (url, first_page),
+            ).fetchone()
+
+        if not row or row[0] != self.fingerprint(body) or row[3] != config:
+            return None
+        return PageData(json.loads(row[1]), json.loads(row[2]), reused=True)
+
+    def put(self, url: str, body: bytes, first_page: bool, config: str, page: PageData) -> None:
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)',
+                (url, first_page, self.fingerprint(body), json.dumps(page.data, default=json_default),
+                 json.dumps(page.errors), config),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
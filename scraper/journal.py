@@ -0,0 +1,89 @@
+import hashlib
+import json
+import sqlite3
+import threading
+
+from dataclasses import asdict
+
+from .models import ResultModel, PageData, json_default
+
+
+def task_key(carrier_id: str | None, arguments: dict) -> str:
+    """
+    Stable id of a task, same for the task and its result
+    """
+    data = json.dumps({'carrier': carrier_id, 'arguments': arguments}, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+# keys of an input task that aren't arguments of the carrier
+TASK_OPTIONS = ('carrier', 'priority', 'deadline')
+
+
+def input_task_key(task: dict) -> str:
+    """
+    task_key of an input task, before its options are taken out
+    """
+    return task_key(task.get('carrier'), {k: v for k, v in task.items() if k not in TASK_OPTIONS})
+
+
+class Journal:
+    """
+    Append-only SQLite log of scraped pages and finished tasks,
+    lets a crashed run resume without fetching those pages again
+    """
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'task_key TEXT, page INTEGER, url TEXT, data TEXT, errors TEXT)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS pages_task_key ON pages (task_key)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results (task_key TEXT PRIMARY KEY, result TEXT)')
+
+        if not resume:
+            with self._lock:
+                self._db.execute('DELETE FROM pages')
+                self._db.execute('DELETE FROM results')
+
+    def record_page(self, key: str, page_number: int | None, url: str, page: PageData) -> None:
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO pages VALUES (?, ?, ?, ?, ?)',
+                (key, page_number, url, json.dumps(page.data, default=json_default), json.dumps(page.errors)),
+            )
+
+    def record_result(self, key: str, result: ResultModel) -> None:
+        with self._lock:
+            self._db.execute(
+                'INSERT OR IGNORE INTO results VALUES (?, ?)', (key, json.dumps(asdict(result), default=json_default)))
+
+    def get_result(self, key: str) -> ResultModel | None:
+        with self._lock:
+            row = self._db.execute('SELECT result FROM results WHERE task_key = ?', (key,)).fetchone()
+
+        return ResultModel(**json.loads(row[0])) if row else None
+
+    def get_pages(self, key: str) -> list[tuple[int | None, str, PageData]]:
+        """
+        Recorded pages of an unfinished task, in page order
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT page, url, data, errors FROM pages WHERE task_key = ? ORDER BY rowid',
+                (key,),
+            ).fetchall()
+
+        return [
+            (page_number, url, PageData(json.loads(data), json.loads(errors)))
+            for page_number, url, data, errors in rows
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,131 @@
+import copy
+import json
+import threading
+
+from collections import defaultdict
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple((name, str(value)) for name, value in labels.items() if value is not None)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prometheus_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Stage timings and counters labelled by carrier, DataConfig and field.
+    Instrumented code takes an optional Metrics and skips all timing
+    when it's None, so disabled metrics cost one check per call site
+    """
+    def __init__(self):
+        # (stage, labels) -> [calls, total seconds, max seconds]
+        self.timings: dict[tuple, list] = defaultdict(lambda: [0, 0.0, 0.0])
+        # (name, labels) -> value
+        self.counters: dict[tuple, float] = defaultdict(float)
+        # added to everything recorded through this object
+        self.labels: dict = {}
+        self._lock = threading.Lock()
+
+    def bind(self, **labels) -> 'Metrics':
+        """
+        Same metrics with more labels added to every record
+        """
+        bound = copy.copy(self)
+        bound.labels = {**self.labels, **labels}
+        return bound
+
+    def add_time(self, stage: str, seconds: float, **labels) -> None:
+        key = (stage, _label_key({**self.labels, **labels}))
+        with self._lock:
+            timing = self.timings[key]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def count(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key({**self.labels, **labels}))
+        with self._lock:
+            self.counters[key] += value
+
+    def snapshot(self) -> tuple[dict, dict]:
+        """
+        Plain picklable copy, for sending metrics between processes
+        """
+        with self._lock:
+            return {key: list(timing) for key, timing in self.timings.items()}, dict(self.counters)
+
+    def merge(self, snapshot: tuple[dict, dict]) -> None:
+        timings, counters = snapshot
+        with self._lock:
+            for key, (calls, total, longest) in timings.items():
+                timing = self.timings[key]
+                timing[0] += calls
+                timing[1] += total
+                timing[2] = max(timing[2], longest)
+            for key, value in counters.items():
+                self.counters[key] += value
+
+    def as_dict(self) -> dict:
+        timings, counters = self.snapshot()
+        return {
+            'timings': [
+                {'stage': stage, 'labels': dict(labels), 'calls': calls,
+                 'total': round(total, 6), 'max': round(longest, 6)}
+                for (stage, labels), (calls, total, longest) in sorted(timings.items())
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+        }
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus text exposition format
+        """
+        timings, counters = self.snapshot()
+        timings = sorted(
+            (_prometheus_labels((('stage', stage),) + labels), timing)
+            for (stage, labels), timing in timings.items()
+        )
+        lines = ['# TYPE scraper_stage_seconds summary']
+        for labels, (calls, total, _) in timings:
+            lines.append(f'scraper_stage_seconds_sum{labels} {total:.6f}')
+            lines.append(f'scraper_stage_seconds_count{labels} {calls}')
+
+        lines.append('# TYPE scraper_stage_seconds_max gauge')
+        for labels, (_, _, longest) in timings:
+            lines.append(f'scraper_stage_seconds_max{labels} {longest:.6f}')
+
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f'# TYPE scraper_{name}_total counter')
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append(f'scraper_{name}_total{_prometheus_labels(labels)} {value:g}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, format: str = 'json') -> None:
+        with open(path, 'w') as file:
+            if format == 'prometheus':
+                file.write(self.to_prometheus())
+            else:
+                json.dump(self.as_dict(), file, indent=4)
+
+    def summary(self) -> str:
+        timings, _ = self.snapshot()
+        stages = defaultdict(float)
+        for (stage, _), (_, total, _) in timings.items():
+            stages[stage] += total
+
+        if not stages:
+            return ''
+        return 'metrics: ' + ', '.join(f'{stage}={total:.2f}s' for stage, total in stages.items())
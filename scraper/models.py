@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
+from decimal import Decimal
 from enum import Enum
-from datetime import datetime, UTC
+from datetime import date, datetime, UTC
+from typing import Any
 
 
 class ResultStatus(Enum):
@@ -18,3 +20,45 @@ class ResultModel:
     data: dict | None = None
     urls: list[str] = field(default_factory=list)
     errors: list[str] = field(default_factory=list)
+    # every page was unchanged since the last run, its stored data was reused
+    reused: bool = False
+    # number of ChunkModel records of the task written before it,
+    # None when array sections are kept in data
+    chunks: int | None = None
+
+
+@dataclass
+class ChunkModel:
+    """
+    Rows of the array sections of one page, written as soon as the page is
+    scraped. The task's ResultModel follows its chunks and has no array sections
+    """
+    carrier: str | None
+    arguments: dict
+    chunk: int
+    page: int | None
+    url: str
+    data: dict
+
+
+@dataclass
+class PageData:
+    """
+    Sections scraped from one page, merged into the task result
+    """
+    data: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    # taken from the PageStore instead of parsing
+    reused: bool = False
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dumps default for converted values, Decimals are written
+    as strings so no digits are lost, dates in ISO format
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
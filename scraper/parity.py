@@ -0,0 +1,95 @@
+"""
+Runs every bundled carrier config over saved pages with every installed
+parser backend and compares the output with the expected one:
+
+    python -m scraper.parity [--samples samples] [--update]
+
+Saved pages live in <samples>/<carrier id>/<name>.html, expected output
+in <name>.json next to them. --update rewrites the expected output
+using the html.parser backend
+"""
+import argparse
+import dataclasses
+import json
+import os
+import sys
+
+from carriers import CARRIER_MAPPING
+
+from .extractor import Extractor
+from .models import json_default
+from .parsers import PARSER_BACKENDS, HTMLParserBackend
+
+
+def _scrape(carrier_id: str, parser: str, html_text: str, first_page: bool) -> dict:
+    config = dataclasses.replace(CARRIER_MAPPING[carrier_id], parser=parser)
+    page = Extractor.scrape_page(config, html_text, first_page)
+    # round trip through json, same as the worker output
+    return json.loads(json.dumps({'data': page.data, 'errors': page.errors}, default=json_default))
+
+
+def _samples(samples_dir: str):
+    for carrier_id in sorted(os.listdir(samples_dir)):
+        if carrier_id not in CARRIER_MAPPING:
+            continue
+
+        carrier_dir = os.path.join(samples_dir, carrier_id)
+        for file_name in sorted(os.listdir(carrier_dir)):
+            if file_name.endswith('.html'):
+                yield carrier_id, os.path.join(carrier_dir, file_name)
+
+
+def update_expected(samples_dir: str) -> None:
+    for carrier_id, html_path in _samples(samples_dir):
+        expected_path = html_path.removesuffix('.html') + '.json'
+        first_page = True
+        if os.path.exists(expected_path):
+            with open(expected_path) as file:
+                first_page = json.load(file).get('first_page', True)
+
+        with open(html_path) as file:
+            result = _scrape(carrier_id, HTMLParserBackend.name, file.read(), first_page)
+
+        with open(expected_path, 'w') as file:
+            json.dump({'first_page': first_page, **result}, file, indent=4)
+            file.write('\n')
+
+
+def check_parity(samples_dir: str) -> list[str]:
+    """
+    Returns a description of every mismatch
+    """
+    mismatches = []
+    for carrier_id, html_path in _samples(samples_dir):
+        with open(html_path) as file:
+            html_text = file.read()
+        with open(html_path.removesuffix('.html') + '.json') as file:
+            expected = json.load(file)
+
+        first_page = expected.pop('first_page', True)
+        for parser in PARSER_BACKENDS:
+            if _scrape(carrier_id, parser, html_text, first_page) != expected:
+                mismatches.append(f'{carrier_id} {os.path.basename(html_path)}: {parser}')
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check parser backends give the same output')
+    parser.add_argument('--samples', default='samples', help='Directory with saved carrier pages')
+    parser.add_argument('--update', action='store_true', help='Rewrite expected output')
+    args = parser.parse_args()
+
+    if args.update:
+        update_expected(args.samples)
+
+    mismatches = check_parity(args.samples)
+    for mismatch in mismatches:
+        print(f'Mismatch: {mismatch}')
+
+    print(f'Parser backends checked: {", ".join(PARSER_BACKENDS)}')
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
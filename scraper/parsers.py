@@ -0,0 +1,169 @@
+import sys
+
+from abc import ABC, abstractmethod
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+class BaseParserBackend(ABC):
+    """
+    Abstract base class for html parser backends.
+    Parsed documents must support what selectors and extractors use
+    from BeautifulSoup: css.select/css.select_one, select_one, get,
+    parent, find_next_sibling, string and str(). parse_only may be ignored
+    """
+    name: str
+
+    @abstractmethod
+    def parse(self, html_text: str, parse_only: SoupStrainer | None = None) -> BeautifulSoup:
+        pass
+
+
+class HTMLParserBackend(BaseParserBackend):
+    """
+    BeautifulSoup with python's html.parser, always available
+    """
+    name = 'html.parser'
+
+    def parse(self, html_text: str, parse_only: SoupStrainer | None = None) -> BeautifulSoup:
+        return BeautifulSoup(html_text, 'html.parser', parse_only=parse_only)
+
+
+class LxmlBackend(BaseParserBackend):
+    """
+    BeautifulSoup with the lxml tree builder, several times faster than html.parser
+    """
+    name = 'lxml'
+
+    def parse(self, html_text: str, parse_only: SoupStrainer | None = None) -> BeautifulSoup:
+        return BeautifulSoup(html_text, 'lxml', parse_only=parse_only)
+
+
+class _SelectolaxCSS:
+    def __init__(self, node: 'SelectolaxNode'):
+        self.node = node
+
+    def select_one(self, css_selector: str) -> 'SelectolaxNode | None':
+        return self.node.select_one(css_selector)
+
+    def select(self, css_selector: str) -> list['SelectolaxNode']:
+        return self.node.select(css_selector)
+
+
+class SelectolaxNode:
+    """
+    Wraps a selectolax node in the part of the bs4 Tag interface
+    the scraper uses
+    """
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    @classmethod
+    def wrap(cls, node) -> 'SelectolaxNode | None':
+        return cls(node) if node is not None else None
+
+    @property
+    def css(self) -> _SelectolaxCSS:
+        return _SelectolaxCSS(self)
+
+    def select_one(self, css_selector: str) -> 'SelectolaxNode | None':
+        return self.wrap(self.node.css_first(css_selector))
+
+    def select(self, css_selector: str) -> list['SelectolaxNode']:
+        return [SelectolaxNode(node) for node in self.node.css(css_selector)]
+
+    def get(self, key: str, default=None):
+        return self.node.attributes.get(key, default)
+
+    def find_next_sibling(self, name: str) -> 'SelectolaxNode | None':
+        node = self.node.next
+        while node is not None and node.tag != name:
+            node = node.next
+        return self.wrap(node)
+
+    @property
+    def parent(self) -> 'SelectolaxNode | None':
+        return self.wrap(self.node.parent)
+
+    def _children(self) -> list:
+        return list(self.node.iter(include_text=True))
+
+    @property
+    def string(self) -> str | None:
+        # same rules as bs4: the only child's string, looked up recursively
+        node = self.node
+        while True:
+            children = list(node.iter(include_text=True))
+            if len(children) != 1:
+                return None
+            node = children[0]
+            if node.tag == '-text':
+                return node.text_content
+
+    def __len__(self) -> int:
+        return len(self._children())
+
+    def __bool__(self) -> bool:
+        # elements are truthy even without children, like bs4 Tags
+        return True
+
+    def __str__(self) -> str:
+        return self.node.html
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SelectolaxNode) and self.node.mem_id == other.node.mem_id
+
+    def __hash__(self) -> int:
+        return self.node.mem_id
+
+
+class SelectolaxBackend(BaseParserBackend):
+    """
+    Lexbor engine from the optional selectolax package, the fastest option
+    """
+    name = 'selectolax'
+
+    def parse(self, html_text: str, parse_only: SoupStrainer | None = None) -> SelectolaxNode:
+        # lexbor always builds the whole tree, it's cheaper than filtering
+        return SelectolaxNode(LexborHTMLParser(html_text).root)
+
+
+PARSER_BACKENDS = {
+    HTMLParserBackend.name: HTMLParserBackend(),
+}
+if lxml:
+    PARSER_BACKENDS[LxmlBackend.name] = LxmlBackend()
+if LexborHTMLParser:
+    PARSER_BACKENDS[SelectolaxBackend.name] = SelectolaxBackend()
+
+DEFAULT_PARSER = LxmlBackend.name if lxml else HTMLParserBackend.name
+
+# backend names already reported as not available
+_missing_backends: set[str] = set()
+
+
+def get_parser_backend(name: str | None = None) -> BaseParserBackend:
+    """
+    Backend by name, DEFAULT_PARSER if not set.
+    Backends whose package isn't installed fall back to html.parser
+    """
+    name = name or DEFAULT_PARSER
+    if name not in PARSER_BACKENDS:
+        if name not in _missing_backends:
+            _missing_backends.add(name)
+            print(f'Error: parser backend {name=} is not available, using html.parser', file=sys.stderr)
+        return PARSER_BACKENDS[HTMLParserBackend.name]
+
+    return PARSER_BACKENDS[name]
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import requests
+
+from concurrent.futures import ProcessPoolExecutor
+
+from carriers import get_carrier_conf
+
+from .models import PageData
+from .extractor import Extractor
+from .metrics import Metrics
+
+
+def parse_page(
+    carrier_id: str,
+    html_text: str,
+    first_page: bool,
+    with_metrics: bool = False,
+) -> tuple[PageData, tuple | None]:
+    """
+    Runs in a pool process, the carrier config is looked up there
+    so only the page text is sent over. Metrics of the page are sent back
+    as a snapshot to merge
+    """
+    metrics = Metrics() if with_metrics else None
+    page = Extractor.scrape_page(
+        get_carrier_conf(carrier_id),
+        html_text,
+        first_page,
+        metrics.bind(carrier=carrier_id) if metrics else None,
+    )
+    return page, metrics.snapshot() if metrics else None
+
+
+class ParsePool:
+    """
+    Parses fetched pages in a pool of processes.
+    At most max_pending pages wait for a process, fetchers handing over
+    more pages wait until one is parsed
+    """
+    def __init__(
+        self,
+        processes: int | None = None,
+        max_pending: int | None = None,
+        metrics: Metrics | None = None,
+    ):
+        processes = processes or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(processes)
+        self.max_pending = max_pending or 2 * processes
+        self.metrics = metrics
+        self._semaphores: dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+
+    async def _parse(self, carrier_id: str, html_text: str, first_page: bool) -> PageData:
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores = {loop: asyncio.Semaphore(self.max_pending)}
+
+        async with self._semaphores[loop]:
+            page, snapshot = await loop.run_in_executor(
+                self.executor, parse_page, carrier_id, html_text, first_page, bool(self.metrics))
+
+        if snapshot:
+            self.metrics.merge(snapshot)
+        return page
+
+    async def parse(
+        self,
+        task: Extractor,
+        responses: list[requests.Response | Exception],
+        pages: list[PageData | None] | None = None,
+    ) -> list[PageData | None]:
+        """
+        Parses successful responses of task.fetch(),
+        other responses are left for Extractor.process.
+        pages already known (Extractor.stored_pages) are kept
+        """
+        first_page = task.current_page == task.config.start_page
+        jobs = []
+        for i, response in enumerate(responses):
+            if pages and pages[i] is not None:
+                jobs.append(asyncio.sleep(0, pages[i]))
+            elif isinstance(response, Exception) or response.status_code != 200:
+                jobs.append(asyncio.sleep(0, None))
+            else:
+                jobs.append(self._parse(task.carrier_id, response.text, first_page and i == 0))
+
+        return list(await asyncio.gather(*jobs))
+
+    def close(self) -> None:
+        self.executor.shutdown()
@@ -0,0 +1,100 @@
+import time
+
+import soupsieve
+
+from bs4 import Tag
+
+from .selectors import CSSSingleSelector
+
+
+class DataPlan:
+    """
+    Compiled DataConfig: extracts the raw values of all of its fields.
+    Single element CSS selectors are all resolved in one walk over
+    the container, every distinct selector is run once per container
+    and every element is serialized at most once for markup extractors
+    """
+    def __init__(self, data_conf):
+        self.fields = data_conf.fields
+        # selector key of every field, None for fields without a selector
+        self.field_keys = []
+        # distinct selectors by key, in field order
+        self.selectors = {}
+        self.css_patterns = {}
+
+        for field_conf in self.fields:
+            selector = field_conf.selector
+            key = selector.cache_key() if selector else None
+            self.field_keys.append(key)
+            if selector and key not in self.selectors:
+                self.selectors[key] = selector
+                if isinstance(selector, CSSSingleSelector):
+                    self.css_patterns[key] = soupsieve.compile(selector.css_selector)
+
+    def _walk(self, html: Tag) -> dict:
+        """
+        First match of every CSS pattern among descendants of html,
+        same as running select_one for each of them
+        """
+        found = {}
+        pending = dict(self.css_patterns)
+        for element in html.descendants:
+            if not isinstance(element, Tag):
+                continue
+
+            for key, pattern in list(pending.items()):
+                if pattern.match(element):
+                    found[key] = element
+                    del pending[key]
+
+            if not pending:
+                break
+
+        return found
+
+    def select(self, html) -> dict:
+        """
+        Element selected by every distinct selector
+        """
+        if html is None:
+            return dict.fromkeys(self.selectors)
+
+        walk = isinstance(html, Tag) and len(self.css_patterns) > 1
+        elements = self._walk(html) if walk else {}
+
+        for key, selector in self.selectors.items():
+            if walk and key in self.css_patterns:
+                elements.setdefault(key, None)
+            else:
+                elements[key] = selector.select(html)
+
+        return elements
+
+    def extract(self, html, metrics=None) -> list:
+        """
+        Raw values of the fields, in field order.
+        metrics (scraper.metrics.Metrics) gets the select and extract timings
+        """
+        if metrics:
+            start = time.perf_counter()
+        elements = self.select(html)
+        if metrics:
+            metrics.add_time('select', time.perf_counter() - start)
+        markups = {}
+        values = []
+
+        for field_conf, key in zip(self.fields, self.field_keys):
+            if metrics:
+                start = time.perf_counter()
+            element = elements[key] if key is not None else html
+            extractor = field_conf.extractor
+            if extractor.needs_markup and element:
+                if id(element) not in markups:
+                    markups[id(element)] = str(element)
+                values.append(extractor.extract_markup(markups[id(element)]))
+            else:
+                values.append(extractor.extract(element))
+            if metrics:
+                metrics.add_time('extract', time.perf_counter() - start, field=field_conf.name)
+
+        return values
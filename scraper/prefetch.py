@@ -0,0 +1,25 @@
+import threading
+
+
+class PrefetchWindow:
+    """
+    Number of pages a multipage extractor fetches at once.
+    Grows while whole windows hold real pages,
+    shrinks by the number of pages fetched past the last one
+    """
+    def __init__(self, size: int = 1, max_size: int = 8):
+        self.size = max(size, 1)
+        self.max_size = max(max_size, self.size)
+        self.wasted = 0
+        self._lock = threading.Lock()
+
+    def update(self, wasted: int | None) -> None:
+        """
+        wasted is None when the window didn't reach the last page
+        """
+        with self._lock:
+            if wasted is None:
+                self.size = min(self.size * 2, self.max_size)
+            else:
+                self.wasted += wasted
+                self.size = max(self.size - wasted, 1)
@@ -0,0 +1,212 @@
+import contextlib
+import sqlite3
+import threading
+import time
+import requests
+
+from datetime import datetime, UTC
+from typing import Callable, Iterator
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from carriers.models import RateLimitConfig
+
+from .clients import BaseHttpClient
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Retry-After header is either a number of seconds or an HTTP date
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if retry_at.tzinfo is None:
+        # '-0000' dates are UTC without a known zone
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max((retry_at - datetime.now(UTC)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    Token bucket limiter with AIMD rate adaptation.
+    Implemented as virtual scheduling: every reservation moves the time
+    the next token becomes available by 1/rate
+    """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.rate = config.rate
+        self.throttled = 0
+        self._next_at = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _state(self, write: bool = True) -> Iterator[None]:
+        """
+        Holds the bucket state for reading and, with write, updating
+        """
+        with self._lock:
+            yield
+
+    def delay(self) -> float:
+        """
+        Seconds until a request could be sent, doesn't take a token
+        """
+        with self._state(write=False):
+            now = self.clock()
+            return self._start_at(now) - now
+
+    def _start_at(self, now: float) -> float:
+        interval = 1 / self.rate
+        return max(now, self._next_at - (self.config.burst - 1) * interval, self._blocked_until)
+
+    def reserve(self) -> float:
+        """
+        Takes a token, returns seconds to wait before using it
+        """
+        with self._state():
+            now = self.clock()
+            start = self._start_at(now)
+            self._next_at = max(self._next_at, start) + 1 / self.rate
+            return start - now
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._state():
+            self.rate = min(self.rate + self.config.increase, self.config.max_rate)
+
+    def on_throttle(self, retry_after: float | None = None) -> None:
+        with self._state():
+            self.throttled += 1
+            self.rate = max(self.rate * self.config.decrease, self.config.min_rate)
+            now = self.clock()
+            # queued reservations were made at the old rate, start over
+            self._next_at = now
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    TokenBucket of one host with its state in an SQLite file,
+    all processes using the file share the rate of the host
+    """
+    clock = staticmethod(time.time)
+
+    def __init__(self, path: str, host: str, config: RateLimitConfig):
+        super().__init__(config)
+        self.host = host
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limits ('
+            'host TEXT PRIMARY KEY, rate REAL, next_at REAL, blocked_until REAL, throttled INTEGER)'
+        )
+        self._db.execute(
+            'INSERT OR IGNORE INTO rate_limits VALUES (?, ?, 0, 0, 0)', (host, config.rate))
+
+    def _load(self) -> None:
+        self.rate, self._next_at, self._blocked_until, self.throttled = self._db.execute(
+            'SELECT rate, next_at, blocked_until, throttled FROM rate_limits WHERE host = ?',
+            (self.host,),
+        ).fetchone()
+
+    @contextlib.contextmanager
+    def _state(self, write: bool = True) -> Iterator[None]:
+        with self._lock:
+            if not write:
+                # a read doesn't take the write lock of the file,
+                # the scheduler asks for the delay of every task it pops
+                self._load()
+                yield
+                return
+
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                self._load()
+                yield
+                self._db.execute(
+                    'UPDATE rate_limits SET rate = ?, next_at = ?, blocked_until = ?, throttled = ? '
+                    'WHERE host = ?',
+                    (self.rate, self._next_at, self._blocked_until, self.throttled, self.host),
+                )
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class RateLimitedClient(BaseHttpClient):
+    """
+    Sends requests through a token bucket per host,
+    429 responses and their Retry-After slow the host down.
+    bucket_factory(host, config) makes the buckets, buckets shared
+    between processes can be plugged in there
+    """
+    def __init__(
+        self,
+        client: BaseHttpClient,
+        bucket_factory: Callable[[str, RateLimitConfig], TokenBucket] | None = None,
+    ):
+        self.client = client
+        self.bucket_factory = bucket_factory or (lambda host, config: TokenBucket(config))
+        self.buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, config: RateLimitConfig) -> None:
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = self.bucket_factory(host, config)
+
+    def get_bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = self.bucket_factory(host, RateLimitConfig())
+            return self.buckets[host]
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        bucket = self.get_bucket(urlparse(url).netloc)
+        bucket.acquire()
+        response = self.client.get(url, **kwargs)
+
+        if response.status_code == 429:
+            bucket.on_throttle(parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            bucket.on_success()
+
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            buckets = list(self.buckets.values())
+        for bucket in buckets:
+            bucket.close()
+
+    def summary(self) -> str:
+        return '\n'.join(
+            f'rate limit {host}: rate={bucket.rate:.2f}/s, throttled={bucket.throttled}'
+            for host, bucket in self.buckets.items()
+        )
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import math
+import time
+
+from datetime import datetime, UTC
+from typing import Callable, Iterator
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def parse_priority(value: int | float | None) -> int | float:
+    """
+    Task priority, 0 if none is given. ValueError unless it's a finite number
+    """
+    if value is None:
+        return 0
+
+    if not _is_number(value):
+        raise ValueError(f'invalid task priority {value!r}, must be a number')
+    return value
+
+
+def parse_deadline(value: float | str | None) -> float | None:
+    """
+    Task deadline as a unix time. Numbers are seconds from now,
+    strings are ISO 8601 datetimes, UTC if no timezone is given.
+    ValueError for anything else
+    """
+    if value is None:
+        return None
+
+    if _is_number(value):
+        return time.time() + value
+
+    try:
+        deadline = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(
+            f'invalid task deadline {value!r}, must be a number of seconds or an ISO datetime'
+        ) from None
+
+    if deadline.tzinfo is None:
+        deadline = deadline.replace(tzinfo=UTC)
+    return deadline.timestamp()
+
+
+class Scheduler:
+    """
+    Queued extractors of every carrier and host. pop() takes the task with
+    the highest priority, then the earliest deadline, among hosts that are
+    ready (ready_in(task) <= 0). Equal heads take turns: hosts first, then
+    the carriers of a host, so neither a carrier with many pages nor a host
+    with many carriers holds up the others.
+    Within a carrier tasks of equal priority and deadline are served in the
+    order they were first queued, a multipage task queued again after a page
+    keeps its place and finishes before newer tasks start
+    """
+    def __init__(self, ready_in: Callable[[object], float] | None = None):
+        # seconds until the host of the task can take a request
+        self.ready_in = ready_in or (lambda task: 0.0)
+        # (host, carrier) -> heap of its tasks
+        self.queues: dict[tuple[str, str | None], list] = {}
+        # hosts in turn order and the carriers of each host in turn order,
+        # the last served ones go to the end
+        self.turns: list[str] = []
+        self.carrier_turns: dict[str, list[str | None]] = {}
+        self._counter = itertools.count()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        for queue in self.queues.values():
+            for *_, task in queue:
+                yield task
+
+    @staticmethod
+    def _rank(task) -> tuple[float, float]:
+        deadline = task.deadline if task.deadline is not None else math.inf
+        return -task.priority, deadline
+
+    def push(self, task) -> None:
+        key = task.host, task.carrier_id
+        if key not in self.queues:
+            self.queues[key] = []
+            if task.host not in self.carrier_turns:
+                self.carrier_turns[task.host] = []
+                self.turns.append(task.host)
+            self.carrier_turns[task.host].append(task.carrier_id)
+        if task.sequence is None:
+            task.sequence = next(self._counter)
+        heapq.heappush(self.queues[key], (*self._rank(task), task.sequence, task))
+        self._size += 1
+
+    def pop(self):
+        """
+        Best ready task, None if no queued task is ready
+        """
+        best = None
+        for host in self.turns:
+            for carrier in self.carrier_turns[host]:
+                queue = self.queues[host, carrier]
+                if not queue:
+                    continue
+
+                head = queue[0]
+                if (best is None or head[:2] < best[1][:2]) and self.ready_in(head[-1]) <= 0:
+                    best = (host, carrier), head
+
+        if best is None:
+            return None
+
+        (host, carrier), _ = best
+        self.turns.remove(host)
+        self.turns.append(host)
+        self.carrier_turns[host].remove(carrier)
+        self.carrier_turns[host].append(carrier)
+        self._size -= 1
+        return heapq.heappop(self.queues[host, carrier])[-1]
+
+    def wait_time(self) -> float:
+        """
+        Seconds until a queued task may be ready, inf if none is queued
+        """
+        return min(
+            (max(self.ready_in(queue[0][-1]), 0.0) for queue in self.queues.values() if queue),
+            default=math.inf,
+        )
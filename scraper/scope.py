@@ -0,0 +1,231 @@
+import re
+
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+
+from bs4 import SoupStrainer
+
+
+_COMPOUND_RE = re.compile(
+    r'(?P<tag>[a-zA-Z][\w-]*|\*)?(?P<parts>(?:#[\w-]+|\.[\w-]+|\[[^\]]*\])*)')
+_PART_RE = re.compile(r'#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)|\[(?P<attr>[^\]]*)\]')
+_ATTR_RE = re.compile(r'\s*(?P<name>[\w-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"[^"]*"|\'[^\']*\'|[^\s]*))?\s*$')
+
+
+@dataclass
+class ScopeMatcher:
+    """
+    Matches start tags by name, id, classes and attributes,
+    while the document is being parsed
+    """
+    tag: str | None = None
+    classes: set[str] = field(default_factory=set)
+    # attribute name -> exact value, None only requires the attribute
+    attrs: dict[str, str | None] = field(default_factory=dict)
+
+    def matches(self, name: str, attrs: dict) -> bool:
+        if self.tag and self.tag != name:
+            return False
+
+        for attr, value in self.attrs.items():
+            if attr not in attrs or (value is not None and attrs[attr] != value):
+                return False
+
+        if self.classes:
+            classes = attrs.get('class') or ''
+            if isinstance(classes, str):
+                classes = classes.split()
+            if not self.classes.issubset(classes):
+                return False
+
+        return True
+
+
+def _split_top_level(css_selector: str, separators: str) -> list[str]:
+    """
+    Splits on separators outside of brackets, parentheses and quotes
+    """
+    parts, current, depth, quote = [], '', 0, None
+    for char in css_selector:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '"\'':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif char in separators and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+
+    parts.append(current)
+    return parts
+
+
+def css_scope(css_selector: str) -> list[ScopeMatcher] | None:
+    """
+    Matchers for elements containing everything css_selector can select:
+    the first compound selector of every group. None when that can't be
+    told from the selector (sibling combinators, pseudo classes)
+    """
+    matchers = []
+    for group in _split_top_level(css_selector, ','):
+        group = group.strip()
+        if not group or len(_split_top_level(group, '+~')) > 1:
+            return None
+
+        match = _COMPOUND_RE.match(group)
+        rest = group[match.end():]
+        if not match.group(0) or (rest and rest[0] not in ' \t\n>'):
+            return None
+
+        tag = match.group('tag')
+        matcher = ScopeMatcher(tag=tag.lower() if tag and tag != '*' else None)
+        for part in _PART_RE.finditer(match.group('parts')):
+            if part.group('id'):
+                matcher.attrs['id'] = part.group('id')
+            elif part.group('cls'):
+                matcher.classes.add(part.group('cls'))
+            else:
+                attr = _ATTR_RE.match(part.group('attr'))
+                if not attr:
+                    return None
+                value = attr.group('value')
+                # other operators only keep more elements than needed
+                exact = attr.group('op') == '=' and value is not None
+                matcher.attrs[attr.group('name').lower()] = value.strip('"\'') if exact else None
+
+        matchers.append(matcher)
+
+    return matchers
+
+
+def css_scope_is_ancestor(css_selector: str) -> bool:
+    """
+    True if the scope of every group of css_selector is an ancestor
+    of the elements it selects, not those elements themselves
+    """
+    for group in _split_top_level(css_selector, ','):
+        group = group.strip()
+        match = _COMPOUND_RE.match(group)
+        if not match.group(0) or not group[match.end():].strip(' \t\n>'):
+            return False
+    return True
+
+
+class _ScopeFilter:
+    def __init__(self, matchers: list[ScopeMatcher]):
+        self.matchers = matchers
+
+    def __call__(self, name, attrs=None) -> bool:
+        return any(matcher.matches(name, attrs or {}) for matcher in self.matchers)
+
+
+def build_parse_filter(data_confs: list) -> SoupStrainer | None:
+    """
+    Parse filter building only the subtrees data_confs read,
+    None if any of them needs the whole document
+    """
+    matchers = []
+    for data_conf in data_confs:
+        selector = data_conf.parse_scope or data_conf.container_selector
+        scope = selector.parse_scope() if selector else None
+        if scope is None:
+            return None
+        matchers.extend(scope)
+
+    if not matchers:
+        return None
+
+    return SoupStrainer(_ScopeFilter(matchers))
+
+
+# elements without content or end tag
+_VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+
+class ScopeScanner(HTMLParser):
+    """
+    Follows a page while it downloads, done once the first element
+    matching every scope has been closed
+    """
+    def __init__(self, scopes: list[list[ScopeMatcher]]):
+        super().__init__()
+        self.scopes = scopes
+        # indices of scopes whose first element hasn't been closed yet
+        self.pending = set(range(len(scopes)))
+        # indices of scopes whose first element is open
+        self.open: set[int] = set()
+        # open elements, (tag, indices of scopes they are the first element of)
+        self.stack: list[tuple[str, set[int]]] = []
+
+    @property
+    def done(self) -> bool:
+        return not self.pending
+
+    def _matched(self, tag: str, attrs: list) -> set[int]:
+        attrs = dict(attrs)
+        return {
+            i for i in self.pending - self.open
+            if any(matcher.matches(tag, attrs) for matcher in self.scopes[i])
+        }
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        matched = self._matched(tag, attrs)
+        if tag in _VOID_ELEMENTS:
+            self.pending -= matched
+            return
+
+        self.open |= matched
+        self.stack.append((tag, matched))
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        self.pending -= self._matched(tag, attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                # elements left open inside are closed with it
+                for _, matched in self.stack[i:]:
+                    self.open -= matched
+                    self.pending -= matched
+                del self.stack[i:]
+                return
+
+
+class StreamScope:
+    """
+    Scopes of the sections read from a page, ScopeScanner tells
+    when the rest of the page can be left unread
+    """
+    def __init__(self, scopes: list[list[ScopeMatcher]]):
+        self.scopes = scopes
+
+    def scanner(self) -> ScopeScanner:
+        return ScopeScanner(self.scopes)
+
+
+def build_stream_scope(data_confs: list) -> StreamScope | None:
+    """
+    Stream scope of data_confs, None if any of them may read
+    anywhere in the document. Rows of an array section follow each other,
+    its scope must be an enclosing element (parse_scope or an ancestor
+    compound of the container selector), not the first row
+    """
+    scopes = []
+    for data_conf in data_confs:
+        selector = data_conf.parse_scope or data_conf.container_selector
+        if data_conf.array and not data_conf.parse_scope and not (selector and selector.scope_is_ancestor()):
+            return None
+        scope = selector.parse_scope() if selector else None
+        if scope is None:
+            return None
+        scopes.append(scope)
+
+    return StreamScope(scopes) if scopes else None
@@ -1,60 +1,497 @@
+import asyncio
+import copy
+import math
 import requests
 import time
 import json
+import sys
 
+from typing import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
 
 from carriers import get_carrier_conf
-from .models import ResultModel, ResultStatus
+from .models import ResultModel, ResultStatus, json_default
 from .extractor import Extractor
+from .clients import SessionPool, CoalescingClient, HedgingClient
+from .ratelimit import RateLimitedClient
+from .cache import ResponseCache, CachingClient
+from .pipeline import ParsePool
+from .sinks import BaseResultSink, ListSink
+from .journal import Journal, task_key, input_task_key, TASK_OPTIONS
+from .prefetch import PrefetchWindow
+from .metrics import Metrics
+from .archive import HttpArchive, RecordingClient, ReplayClient
+from .fingerprints import PageStore
+from .scheduler import Scheduler, parse_deadline, parse_priority
 
 
 class Worker:
     def __init__(
         self,
         delay_ms: int = 0,
+        pool_size: int = 10,
+        cache: ResponseCache | None = None,
+        sink: BaseResultSink | None = None,
+        journal: Journal | None = None,
+        metrics: Metrics | None = None,
+        record: HttpArchive | None = None,
+        replay: HttpArchive | None = None,
+        page_store: PageStore | None = None,
+        chunk_arrays: bool = False,
     ):
         self.delay_ms = delay_ms
-        self.tasks = []
-        self.scraped_data = []
+        self.tasks = Scheduler(self._ready_in)
+        # tasks read lazily, extractors are created as queue slots free up
+        self.task_source: Iterator[dict] | None = None
+        self.queue_size = 100
+        self.sink = sink or ListSink()
+        self.journal = journal
+        self.page_store = page_store
+        self.session_pool = SessionPool(pool_size)
+        self.rate_limiter = RateLimitedClient(self.session_pool)
+        # hedged requests take rate limiter tokens like any other
+        self.hedging = HedgingClient(self.rate_limiter)
+        self.client = self.hedging
+        # components with a summary() printed after the run
+        self.stats_sources = [self.session_pool, self.rate_limiter, self.hedging]
+        if cache:
+            # cache hits don't take rate limiter tokens
+            self.client = CachingClient(self.client, cache)
+            self.stats_sources.append(self.client)
+        # extractors of different tasks may ask for the same page at once
+        self.client = CoalescingClient(self.client)
+        self.stats_sources.append(self.client)
+        if replay:
+            # no network, responses come from the archive as recorded
+            self.client = ReplayClient(replay)
+            self.stats_sources.append(self.client)
+        elif record:
+            self.client = RecordingClient(self.client, record)
+            self.stats_sources.append(self.client)
+        self.archive = replay or record
+        # shared by all extractors of a carrier, so the window learns
+        # typical page counts across customers
+        self.prefetch_windows: dict[str, PrefetchWindow] = {}
+        self.metrics = metrics
+        if metrics:
+            self.stats_sources.append(metrics)
+        # task key -> duplicates of the in-flight task, they get copies of its result
+        self.inflight: dict[str, list[dict]] = {}
+        # array sections are written page by page as ChunkModels
+        self.chunk_arrays = chunk_arrays
+
+    @property
+    def scraped_data(self) -> list[ResultModel]:
+        """
+        Results kept in memory, empty for streaming sinks
+        """
+        return getattr(self.sink, 'results', [])
 
     def get_json_scraped_data(self):
         data = [asdict(d) for d in self.scraped_data]
-        return json.dumps(data, indent=4)
+        return json.dumps(data, indent=4, default=json_default)
+
+    def _make_extractor(self, task: dict) -> Extractor | None:
+        """
+        Extractor for the task, tasks of unknown carriers go
+        straight to the sink as errors.
+        Optional priority (number, higher first) and deadline (seconds from
+        now or ISO datetime) of the task are used for scheduling only,
+        ValueError if they are invalid
+        """
+        key = input_task_key(task)
+        priority = parse_priority(task.pop('priority', None))
+        deadline = parse_deadline(task.pop('deadline', None))
+
+        carrier_conf = get_carrier_conf(task.get('carrier'))
+        if not carrier_conf:
+            self._emit(
+                ResultModel(
+                    status=ResultStatus.error.value,
+                    carrier=task.pop('carrier', None),
+                    arguments=task,
+                    errors=['Unknown carrier'],
+                )
+            )
+            return None
+
+        if self.journal:
+            result = self.journal.get_result(key)
+            if result:
+                # finished before the crash, its result is emitted again
+                if self.chunk_arrays:
+                    # with the chunks of its recorded pages
+                    extractor = Extractor(task, carrier_conf, chunk_arrays=True)
+                    extractor.restore(self.journal.get_pages(key))
+                    self._write_chunks(extractor)
+                self._emit(result)
+                return None
+
+        if key in self.inflight:
+            # same task is already running
+            self.inflight[key].append(task)
+            if self.metrics:
+                self.metrics.count('deduplicated', carrier=task.get('carrier'))
+            return None
+        self.inflight[key] = []
+
+        prefetch = self.prefetch_windows.setdefault(
+            task.get('carrier'),
+            PrefetchWindow(carrier_conf.prefetch_window, carrier_conf.max_prefetch_window),
+        )
+        extractor = Extractor(
+            task,
+            carrier_conf,
+            client=self.client,
+            prefetch=prefetch,
+            journal=self.journal,
+            metrics=self.metrics,
+            page_store=self.page_store,
+            priority=priority,
+            deadline=deadline,
+            chunk_arrays=self.chunk_arrays,
+        )
+        self.rate_limiter.configure(extractor.host, carrier_conf.rate_limit)
+        self.hedging.configure(extractor.host, carrier_conf.hedge_requests)
+
+        if self.journal and carrier_conf.multipage:
+            pages = self.journal.get_pages(extractor.key)
+            if pages:
+                # chunks of the recorded pages are written again with their
+                # numbers, like the ones of finished tasks
+                extractor.restore(pages)
+
+        return extractor
+
+    def _queue_task(self, task: dict) -> None:
+        """
+        Queues the extractor of the task, a task that can't be
+        started is finished with error and the others keep running
+        """
+        try:
+            extractor = self._make_extractor(task)
+            if extractor:
+                self.tasks.push(extractor)
+        except Exception as e:
+            print(f'Error: task {task} failed: {e}', file=sys.stderr)
+            self._emit(
+                ResultModel(
+                    status=ResultStatus.error.value,
+                    carrier=task.get('carrier'),
+                    arguments={k: v for k, v in task.items() if k not in TASK_OPTIONS},
+                    errors=[f'Task failed: {e}'],
+                )
+            )
+
+    def _emit(self, result: ResultModel) -> None:
+        key = task_key(result.carrier, result.arguments)
+        # journal first, a result lost from the sink by a crash is emitted on resume
+        if self.journal:
+            self.journal.record_result(key, result)
+
+        duplicates = self.inflight.pop(key, [])
+        for result in [result] + [copy.deepcopy(result) for _ in duplicates]:
+            if self.metrics:
+                self.metrics.count('tasks', carrier=result.carrier, status=result.status)
+            self.sink.write(result)
+
+    def _write_chunks(self, task: Extractor) -> None:
+        """
+        Writes the chunks the task scraped so far, before its result.
+        Duplicates of the task share its chunks
+        """
+        for chunk in task.take_chunks():
+            self.sink.write(chunk)
+
+    def _ready_in(self, task: Extractor) -> float:
+        """
+        Seconds until the host of the task can take a request
+        """
+        return self.rate_limiter.get_bucket(task.host).delay()
 
     def add_tasks(self, tasks: list[dict]) -> None:
         for task in tasks:
-            carrier_conf = get_carrier_conf(task.get('carrier'))
-            if not carrier_conf:
-                self.scraped_data.append(
-                    ResultModel(
-                        status=ResultStatus.error.value,
-                        carrier=task.pop('carrier', None),
-                        arguments=task,
-                        errors=['Unknown carrier'],
-                    )
-                )
-            else:
-                self.tasks.append(Extractor(task, carrier_conf))
+            self._queue_task(task)
+
+    def add_task_stream(self, tasks: Iterable[dict], queue_size: int = 100) -> None:
+        """
+        Tasks are read lazily while running,
+        at most queue_size extractors exist at once
+        """
+        self.task_source = iter(tasks)
+        self.queue_size = queue_size
+
+    def _refill_tasks(self) -> None:
+        while self.task_source is not None and len(self.tasks) < self.queue_size:
+            task = next(self.task_source, None)
+            if task is None:
+                self.task_source = None
+                return
+
+            self._queue_task(task)
+
+    def _handle_request_error(self, task: Extractor, error: requests.RequestException) -> bool:
+        """
+        Returns True if task should be retried,
+        otherwise task is finished with error
+        """
+        # pages merged before the failed request
+        self._write_chunks(task)
+        if task.timed_out:
+            self._emit(task.fail_timeout())
+            return False
+
+        status_code = error.response.status_code if error.response is not None else None
+        if isinstance(error, requests.Timeout) and self.metrics:
+            self.metrics.count('timeouts', carrier=task.carrier_id)
+        # the rate limiter already slowed the host down on 429,
+        # server errors, timeouts and lost connections are retried as they are
+        transient = (
+            status_code == 429
+            or (status_code or 0) >= 500
+            or isinstance(error, (requests.Timeout, requests.ConnectionError))
+        )
+        if transient and task.tries < task.tries_limit:
+            task.tries += 1
+            if self.metrics:
+                self.metrics.count('retries', carrier=task.carrier_id, status=status_code)
+            return True
+
+        self._emit(task.fail(f'url: error {status_code or error}'))
+        return False
+
+    def close(self) -> None:
+        self.hedging.close()
+        self.rate_limiter.close()
+        self.session_pool.close()
+        self.sink.close()
+        if self.journal:
+            self.journal.close()
+        if self.archive:
+            self.archive.close()
+        if self.page_store:
+            self.page_store.close()
+
+    def print_summary(self) -> None:
+        for source in self.stats_sources:
+            summary = source.summary()
+            if summary:
+                print(summary, file=sys.stderr)
 
     def run_tasks(self) -> None:
+        start = time.perf_counter()
+        self._refill_tasks()
         if not self.tasks:
-            print('Task queue is empty')
+            print('Task queue is empty', file=sys.stderr)
 
         while self.tasks:
             task = self.tasks.pop()
+            if task is None:
+                # every queued host is backed off
+                time.sleep(min(self.tasks.wait_time(), 1.0))
+                continue
+
             try:
                 result = task.run()
+                self._write_chunks(task)
                 if result.status == ResultStatus.pending.value:
                     # Re-queue task if not completed
-                    self.tasks.append(task)
+                    self.tasks.push(task)
                 else:
-                    self.scraped_data.append(result)
-            except requests.HTTPError as e:
-                # Handle rate limiting by increasing delay
-                if e == '429':
-                    self.delay_ms += 500
+                    self._emit(result)
+            except requests.RequestException as e:
+                if self._handle_request_error(task, e):
+                    self.tasks.push(task)
+            except Exception as e:
+                print(f'Error: task {task.carrier_id} {task.arguments} failed: {e}', file=sys.stderr)
+                self._emit(task.fail(f'Task failed: {e}'))
 
+            self._refill_tasks()
             time.sleep(self.delay_ms / 1000)
 
-        print('All tasks processed')
+        if self.metrics:
+            self.metrics.add_time('run', time.perf_counter() - start)
+        print('All tasks processed', file=sys.stderr)
+        self.print_summary()
+
+
+class AsyncWorker(Worker):
+    """
+    Keeps many extractors in flight at once.
+    Blocking Extractor.run calls are offloaded to a thread pool, concurrency
+    is limited globally and per carrier host (ParserConfig.max_concurrency).
+    With parse_processes pages are only fetched on threads and parsed
+    in a process pool, so parsing doesn't hold up fetching
+    """
+    def __init__(
+        self,
+        delay_ms: int = 0,
+        max_concurrency: int = 20,
+        host_concurrency: int | None = None,
+        pool_size: int | None = None,
+        cache: ResponseCache | None = None,
+        parse_processes: int | None = None,
+        sink: BaseResultSink | None = None,
+        journal: Journal | None = None,
+        metrics: Metrics | None = None,
+        record: HttpArchive | None = None,
+        replay: HttpArchive | None = None,
+        page_store: PageStore | None = None,
+        chunk_arrays: bool = False,
+    ):
+        super().__init__(
+            delay_ms,
+            pool_size or max_concurrency,
+            cache,
+            sink,
+            journal,
+            metrics,
+            record,
+            replay,
+            page_store,
+            chunk_arrays,
+        )
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = host_concurrency or max_concurrency
+        self.parse_pool = ParsePool(parse_processes, metrics=metrics) if parse_processes else None
+        self.host_semaphores: dict[str, asyncio.Semaphore] = {}
+        # tasks taken from the scheduler and not yet finished or queued again
+        self._active = 0
+
+    def close(self) -> None:
+        super().close()
+        if self.parse_pool:
+            self.parse_pool.close()
+
+    def _ready_in(self, task: Extractor) -> float:
+        semaphore = self.host_semaphores.get(task.host)
+        if semaphore and semaphore.locked():
+            # a finishing task of the host wakes the consumers up
+            return math.inf
+        return super()._ready_in(task)
+
+    def _host_limits(self) -> dict[str, int]:
+        # carriers sharing a host share its limit, the strictest one wins
+        limits = {}
+        for task in self.tasks:
+            limit = task.config.max_concurrency or self.host_concurrency
+            limits[task.host] = min(limit, limits.get(task.host, limit))
+        return limits
+
+    def run_tasks(self) -> None:
+        start = time.perf_counter()
+        if not self.tasks and self.task_source is None:
+            print('Task queue is empty', file=sys.stderr)
+        else:
+            asyncio.run(self._run_tasks())
+
+        if self.metrics:
+            self.metrics.add_time('run', time.perf_counter() - start)
+
+        print('All tasks processed', file=sys.stderr)
+        self.print_summary()
+
+    async def _produce(self, wakeup: asyncio.Condition) -> None:
+        loop = asyncio.get_running_loop()
+        while self.task_source is not None:
+            async with wakeup:
+                await wakeup.wait_for(lambda: len(self.tasks) < self.queue_size)
+
+            # reading the source may block on the file
+            task = await loop.run_in_executor(None, next, self.task_source, None)
+            if task is None:
+                self.task_source = None
+            else:
+                self._queue_task(task)
+
+            async with wakeup:
+                wakeup.notify_all()
+
+    async def _next_task(self, wakeup: asyncio.Condition) -> Extractor | None:
+        """
+        Waits for a ready task, None once every task is finished
+        """
+        async with wakeup:
+            while True:
+                task = self.tasks.pop()
+                if task:
+                    self._active += 1
+                    wakeup.notify_all()
+                    return task
+
+                if not self.tasks and not self._active and self.task_source is None:
+                    return None
+
+                timeout = self.tasks.wait_time()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), None if math.isinf(timeout) else timeout)
+                except TimeoutError:
+                    pass
+
+    async def _consume(self, wakeup: asyncio.Condition, *args) -> None:
+        while (task := await self._next_task(wakeup)) is not None:
+            try:
+                if await self._run_task(task, *args):
+                    self.tasks.push(task)
+            finally:
+                async with wakeup:
+                    self._active -= 1
+                    wakeup.notify_all()
+
+    async def _run_tasks(self) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.host_semaphores = {
+            host: asyncio.Semaphore(limit) for host, limit in self._host_limits().items()
+        }
+        self._active = 0
+        wakeup = asyncio.Condition()
+        # extra consumers keep fetch slots busy while others wait for parsing
+        consumers = self.max_concurrency + (self.parse_pool.max_pending if self.parse_pool else 0)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            await asyncio.gather(
+                self._produce(wakeup),
+                *(self._consume(wakeup, executor, semaphore) for _ in range(consumers)),
+            )
+
+    async def _run_task(
+        self,
+        task: Extractor,
+        executor: ThreadPoolExecutor,
+        semaphore: asyncio.Semaphore,
+    ) -> bool:
+        """
+        Runs one step of the task (a page or a prefetch window),
+        returns True if the task has to be queued again
+        """
+        loop = asyncio.get_running_loop()
+        if task.host not in self.host_semaphores:
+            self.host_semaphores[task.host] = asyncio.Semaphore(
+                task.config.max_concurrency or self.host_concurrency)
+        host_semaphore = self.host_semaphores[task.host]
+
+        try:
+            if self.parse_pool:
+                async with host_semaphore, semaphore:
+                    responses = await loop.run_in_executor(executor, task.fetch)
+                # unchanged pages aren't sent to the pool
+                pages = await self.parse_pool.parse(task, responses, task.stored_pages(responses))
+                result = task.process(responses, pages)
+            else:
+                async with host_semaphore, semaphore:
+                    result = await loop.run_in_executor(executor, task.run)
+        except requests.RequestException as e:
+            return self._handle_request_error(task, e)
+        except Exception as e:
+            print(f'Error: task {task.carrier_id} {task.arguments} failed: {e}', file=sys.stderr)
+            self._emit(task.fail(f'Task failed: {e}'))
+            return False
+
+        self._write_chunks(task)
+        if result.status != ResultStatus.pending.value:
+            self._emit(result)
+            return False
+
+        await asyncio.sleep(self.delay_ms / 1000)
+        return True
@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 
 from bs4 import BeautifulSoup
 
+from .scope import ScopeMatcher, css_scope, css_scope_is_ancestor
+
 
 class BaseElementSelector(ABC):
     """
@@ -12,6 +14,26 @@ class BaseElementSelector(ABC):
     def select(self, html: BeautifulSoup) -> BeautifulSoup:
         pass
 
+    def parse_scope(self) -> list[ScopeMatcher] | None:
+        """
+        Matchers for elements containing everything the selector can select,
+        None if it may select anything in the document
+        """
+        return None
+
+    def scope_is_ancestor(self) -> bool:
+        """
+        True if the parse scope encloses the selected elements
+        instead of matching them
+        """
+        return False
+
+    def cache_key(self) -> tuple:
+        """
+        Selectors with equal keys select the same elements
+        """
+        return type(self), id(self)
+
 
 class CSSSingleSelector(BaseElementSelector):
     def __init__(self, css_selector: str):
@@ -20,6 +42,15 @@ class CSSSingleSelector(BaseElementSelector):
     def select(self, html: BeautifulSoup) -> BeautifulSoup:
         return html.css.select_one(self.css_selector)
 
+    def parse_scope(self) -> list[ScopeMatcher] | None:
+        return css_scope(self.css_selector)
+
+    def scope_is_ancestor(self) -> bool:
+        return css_scope_is_ancestor(self.css_selector)
+
+    def cache_key(self) -> tuple:
+        return type(self), self.css_selector
+
 
 class CSSMultiSelector(BaseElementSelector):
     def __init__(self, css_selector: str):
@@ -28,11 +59,23 @@ class CSSMultiSelector(BaseElementSelector):
     def select(self, html: BeautifulSoup) -> BeautifulSoup:
         return html.css.select(self.css_selector)
 
+    def parse_scope(self) -> list[ScopeMatcher] | None:
+        return css_scope(self.css_selector)
+
+    def scope_is_ancestor(self) -> bool:
+        return css_scope_is_ancestor(self.css_selector)
+
+    def cache_key(self) -> tuple:
+        return type(self), self.css_selector
+
 
 class CSSNextSiblingSelector(BaseElementSelector):
     def select(self, html: BeautifulSoup) -> BeautifulSoup:
         return html.next_sibling
 
+    def cache_key(self) -> tuple:
+        return (type(self),)
+
 
 class CustomSelector(BaseElementSelector):
     def __init__(self, select_method: Callable):
@@ -40,3 +83,6 @@ class CustomSelector(BaseElementSelector):
 
     def select(self, html: BeautifulSoup) -> BeautifulSoup:
         return self.select_method(html)
+
+    def cache_key(self) -> tuple:
+        return type(self), self.select_method
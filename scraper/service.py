@@ -0,0 +1,416 @@
+import io
+import json
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+import time
+import uuid
+
+from collections import deque
+from dataclasses import asdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Iterator
+from urllib.parse import urlparse, parse_qs
+
+from .models import ResultModel, json_default
+from .journal import task_key, input_task_key
+from .scheduler import parse_deadline, parse_priority
+from .sinks import BaseResultSink
+from .tasks import iter_tasks
+
+
+class Batch:
+    """
+    Tasks submitted together and their results in the order they finished
+    """
+    def __init__(self, tasks: int):
+        self.id = uuid.uuid4().hex
+        self.tasks = tasks
+        self.results: list[ResultModel] = []
+        self.created = time.monotonic()
+        self.finished_at: float | None = None if tasks else self.created
+        # set when the batch can't finish, its tasks get no more results
+        self.error: str | None = None
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return len(self.results) >= self.tasks or self.error is not None
+
+    def add(self, result: ResultModel) -> None:
+        with self.changed:
+            self.results.append(result)
+            if self.done:
+                self.finished_at = time.monotonic()
+            self.changed.notify_all()
+
+    def fail(self, error: str) -> None:
+        with self.changed:
+            if self.done:
+                return
+            self.error = error
+            self.finished_at = time.monotonic()
+            self.changed.notify_all()
+
+    def wait(self, count: int, timeout: float | None = None) -> bool:
+        """
+        Waits until the batch has more than count results or is done,
+        False on timeout
+        """
+        with self.changed:
+            return self.changed.wait_for(lambda: len(self.results) > count or self.done, timeout)
+
+    def as_dict(self, since: int = 0) -> dict:
+        return {
+            'id': self.id,
+            'tasks': self.tasks,
+            'finished': len(self.results),
+            'done': self.done,
+            'error': self.error,
+            'results': [asdict(result) for result in self.results[since:]],
+        }
+
+
+def validate_task(task) -> str | None:
+    """
+    Error of a submitted task the worker can't run, None if it's valid.
+    Tasks are keyed and deduplicated by their values, so they must be scalars,
+    priority and deadline must be ones the scheduler can order by
+    """
+    if not isinstance(task, dict):
+        return 'Every task must be a JSON object'
+    if not isinstance(task.get('carrier'), str):
+        return 'carrier of every task must be a string'
+    for name, value in task.items():
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            return f'{name} must be a string, number, boolean or null'
+    try:
+        parse_priority(task.get('priority'))
+        parse_deadline(task.get('deadline'))
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+class TaskFeed:
+    """
+    Endless task source of the worker, iteration blocks until a task
+    is put and stops after close()
+    """
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue()
+
+    def __iter__(self) -> Iterator[dict]:
+        return self
+
+    def __next__(self) -> dict:
+        task = self.queue.get()
+        if task is None:
+            raise StopIteration
+        return task
+
+    def put(self, task: dict) -> None:
+        self.queue.put(task)
+
+    def close(self) -> None:
+        self.queue.put(None)
+
+
+class BatchSink(BaseResultSink):
+    """
+    Hands every result to the oldest batch waiting for its task
+    """
+    def __init__(self):
+        # task key -> batches waiting for a result of that task, oldest first
+        self.waiting: dict[str, deque[Batch]] = {}
+        self._lock = threading.Lock()
+
+    def expect(self, key: str, batch: Batch) -> None:
+        with self._lock:
+            self.waiting.setdefault(key, deque()).append(batch)
+
+    def write(self, result: ResultModel) -> None:
+        key = task_key(result.carrier, result.arguments)
+        with self._lock:
+            batches = self.waiting.get(key)
+            if not batches:
+                return
+            batch = batches.popleft()
+            if not batches:
+                del self.waiting[key]
+        batch.add(result)
+
+
+class ScrapeService:
+    """
+    Runs one worker (scraper.scraper.AsyncWorker) for the lifetime of the
+    process, so sessions, rate limiters, caches and prefetch windows stay
+    warm between batches. Finished batches are dropped after batch_ttl seconds,
+    requests waiting for results answer after at most wait_timeout seconds
+    """
+    def __init__(self, worker, batch_ttl: float = 3600, wait_timeout: float = 60):
+        self.worker = worker
+        self.batch_ttl = batch_ttl
+        self.wait_timeout = wait_timeout
+        # why the worker stopped, the service then takes no more batches
+        self.error: str | None = None
+        self.batches: dict[str, Batch] = {}
+        self.feed = TaskFeed()
+        self.sink = BatchSink()
+        worker.sink = self.sink
+        worker.add_task_stream(self.feed, queue_size=worker.queue_size)
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        try:
+            self.worker.run_tasks()
+        except Exception as e:
+            print(f'Error: worker stopped: {e}', file=sys.stderr)
+            self.error = f'Worker stopped: {e}'
+            with self._lock:
+                batches = list(self.batches.values())
+            for batch in batches:
+                batch.fail(self.error)
+
+    @property
+    def running(self) -> bool:
+        return self.error is None
+
+    def start(self) -> 'ScrapeService':
+        self._thread.start()
+        return self
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for batch_id, batch in list(self.batches.items()):
+                if batch.finished_at is not None and now - batch.finished_at > self.batch_ttl:
+                    del self.batches[batch_id]
+
+    def submit(self, tasks: list[dict]) -> Batch:
+        self._expire()
+        batch = Batch(len(tasks))
+        with self._lock:
+            self.batches[batch.id] = batch
+        if not self.running:
+            batch.fail(self.error)
+            return batch
+
+        for task in tasks:
+            # registered before the worker can finish the task
+            self.sink.expect(input_task_key(task), batch)
+        for task in tasks:
+            self.feed.put(task)
+
+        return batch
+
+    def get(self, batch_id: str) -> Batch | None:
+        with self._lock:
+            return self.batches.get(batch_id)
+
+    def remove(self, batch_id: str) -> bool:
+        with self._lock:
+            return self.batches.pop(batch_id, None) is not None
+
+    def status(self) -> dict:
+        with self._lock:
+            batches = list(self.batches.values())
+        return {
+            'batches': len(batches),
+            'running_batches': sum(not batch.done for batch in batches),
+            'queued_tasks': len(self.worker.tasks),
+            'error': self.error,
+        }
+
+    def close(self) -> None:
+        """
+        Lets the worker finish the submitted tasks, then closes it
+        """
+        self.feed.close()
+        self._thread.join()
+        self.worker.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    POST /batches                 submit a JSON array or NDJSON of tasks,
+                                  ?wait=1 answers once the batch is done
+    GET /batches/<id>?since=N     results from the N-th one on, ?wait=1 blocks
+                                  until there is a new one
+    GET /batches/<id>/results     NDJSON stream of results as they finish
+    DELETE /batches/<id>          forget the batch
+    GET /status, GET /metrics     service state, Prometheus metrics
+    """
+    protocol_version = 'HTTP/1.1'
+    server: 'ServiceHTTPServer | ServiceUnixServer'
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: dict | str, content_type: str = 'application/json') -> None:
+        data = (json.dumps(body, default=json_default) if isinstance(body, dict) else body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self) -> tuple[list[str], dict]:
+        url = urlparse(self.path)
+        return [part for part in url.path.split('/') if part], parse_qs(url.query)
+
+    @staticmethod
+    def _flag(query: dict, name: str) -> bool:
+        return query.get(name, ['0'])[0].lower() in ('1', 'true', 'yes')
+
+    def do_POST(self) -> None:
+        parts, query = self._route()
+        if parts != ['batches']:
+            self._send(404, {'error': 'Not found'})
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        try:
+            tasks = list(iter_tasks(io.StringIO(body)))
+        except json.JSONDecodeError as e:
+            self._send(400, {'error': f'Invalid JSON: {e}'})
+            return
+        for task in tasks:
+            error = validate_task(task)
+            if error:
+                self._send(400, {'error': error, 'task': task})
+                return
+
+        service = self.server.service
+        if not service.running:
+            self._send(503, {'error': service.error})
+            return
+
+        batch = service.submit(tasks)
+        if not self._flag(query, 'wait'):
+            self._send(202, {'id': batch.id, 'tasks': batch.tasks})
+            return
+
+        # a batch still running after wait_timeout is answered with its
+        # results so far, poll GET /batches/<id> for the rest
+        with batch.changed:
+            batch.changed.wait_for(lambda: batch.done, service.wait_timeout)
+        self._send(200 if batch.done else 202, batch.as_dict())
+
+    def do_GET(self) -> None:
+        parts, query = self._route()
+        service = self.server.service
+
+        if parts == ['status']:
+            self._send(200, service.status())
+            return
+        if parts == ['metrics']:
+            if not service.worker.metrics:
+                self._send(404, {'error': 'Metrics are disabled'})
+            else:
+                self._send(200, service.worker.metrics.to_prometheus(), 'text/plain; version=0.0.4')
+            return
+
+        batch = service.get(parts[1]) if len(parts) in (2, 3) and parts[0] == 'batches' else None
+        if not batch or (len(parts) == 3 and parts[2] != 'results'):
+            self._send(404, {'error': 'Not found'})
+            return
+
+        if len(parts) == 3:
+            self._stream(batch)
+            return
+
+        try:
+            since = int(query.get('since', ['0'])[0])
+        except ValueError:
+            since = -1
+        if since < 0:
+            self._send(400, {'error': 'since must be a non-negative integer'})
+            return
+
+        if self._flag(query, 'wait'):
+            batch.wait(since, service.wait_timeout)
+        self._send(200, batch.as_dict(since))
+
+    def _stream(self, batch: Batch) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        sent = 0
+        while True:
+            batch.wait(sent)
+            results = batch.results[sent:]
+            for result in results:
+                line = (json.dumps(asdict(result), default=json_default) + '\n').encode()
+                self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+            self.wfile.flush()
+            sent += len(results)
+            # results of a failed batch stop with its error
+            if batch.done and sent >= len(batch.results):
+                break
+
+        self.wfile.write(b'0\r\n\r\n')
+
+    def do_DELETE(self) -> None:
+        parts, _ = self._route()
+        if len(parts) == 2 and parts[0] == 'batches' and self.server.service.remove(parts[1]):
+            self._send(200, {'id': parts[1]})
+        else:
+            self._send(404, {'error': 'Not found'})
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    def __init__(self, address: tuple[str, int], service: ScrapeService):
+        self.service = service
+        super().__init__(address, ServiceHandler)
+
+
+class ServiceUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: ScrapeService):
+        self.service = service
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, ServiceHandler)
+
+
+def make_server(address: str, service: ScrapeService) -> ServiceHTTPServer | ServiceUnixServer:
+    """
+    HOST:PORT listens on TCP, anything else is a unix socket path
+    """
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return ServiceHTTPServer((host, int(port)), service)
+    return ServiceUnixServer(address, service)
+
+
+def serve(service: ScrapeService, address: str) -> None:
+    """
+    Serves the API until SIGINT or SIGTERM, then finishes
+    the submitted tasks and closes the worker
+    """
+    server = make_server(address, service)
+    service.start()
+    print(f'Serving on {address}', file=sys.stderr, flush=True)
+
+    def stop(signum, frame):
+        # shutdown() waits for serve_forever, which runs in this thread
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if isinstance(server, ServiceUnixServer):
+            os.unlink(address)
+        service.close()
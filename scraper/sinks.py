@@ -0,0 +1,65 @@
+import json
+import sys
+
+from abc import ABC, abstractmethod
+from dataclasses import asdict
+from typing import TextIO
+
+from .models import ResultModel, ChunkModel, json_default
+
+
+class BaseResultSink(ABC):
+    """
+    Abstract base class for destinations of finished results,
+    and of the chunks of array sections written before them
+    """
+    @abstractmethod
+    def write(self, result: ResultModel | ChunkModel) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class ListSink(BaseResultSink):
+    """
+    Keeps all results in memory, dumped as one pretty JSON list at the end
+    """
+    def __init__(self):
+        self.results: list[ResultModel | ChunkModel] = []
+
+    def write(self, result: ResultModel | ChunkModel) -> None:
+        self.results.append(result)
+
+
+class NDJSONSink(BaseResultSink):
+    """
+    Writes every result as one JSON line as soon as it's finished,
+    nothing is kept in memory. Output is flushed every flush_every results,
+    an output file is overwritten like the one of --format json
+    """
+    def __init__(self, output: str | TextIO | None = None, flush_every: int = 100):
+        if isinstance(output, str):
+            self.stream = open(output, 'w')
+            self._owns_stream = True
+        else:
+            self.stream = output or sys.stdout
+            self._owns_stream = False
+
+        self.flush_every = flush_every
+        self._pending = 0
+
+    def write(self, result: ResultModel | ChunkModel) -> None:
+        self.stream.write(json.dumps(asdict(result), default=json_default) + '\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self) -> None:
+        self.stream.flush()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._owns_stream:
+            self.stream.close()
@@ -0,0 +1,318 @@
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict
+from typing import Iterable, Iterator
+
+from carriers.models import RateLimitConfig
+
+from .models import ResultModel, ResultStatus, json_default
+from .journal import task_key, input_task_key
+from .ratelimit import TokenBucket, SQLiteTokenBucket
+from .sinks import BaseResultSink, ListSink, NDJSONSink
+
+
+@dataclass
+class Lease:
+    task_id: int
+    task: dict
+    worker_id: str
+
+
+class BaseTaskQueue(ABC):
+    """
+    Abstract base class for task queues shared by several workers.
+    A leased task is hidden from other workers until its lease expires,
+    workers extend their leases with heartbeats while they run the tasks
+    """
+    # seconds a lease lasts without a heartbeat
+    lease_timeout: float = 60
+
+    @abstractmethod
+    def put(self, tasks: Iterable[dict]) -> int:
+        pass
+
+    @abstractmethod
+    def lease(self, worker_id: str, count: int = 1) -> list[Lease]:
+        """
+        Leases up to count pending tasks or tasks with expired leases
+        """
+        pass
+
+    @abstractmethod
+    def heartbeat(self, worker_id: str, task_ids: list[int]) -> None:
+        pass
+
+    @abstractmethod
+    def complete(self, lease: Lease, result: ResultModel) -> bool:
+        """
+        Stores the result, returns False if the task already has one
+        """
+        pass
+
+    @abstractmethod
+    def unfinished(self) -> int:
+        pass
+
+    @abstractmethod
+    def results(self) -> Iterator[ResultModel]:
+        pass
+
+    def make_bucket(self, host: str, config: RateLimitConfig) -> TokenBucket:
+        """
+        Rate limiter bucket of a host, shared by the workers of the queue
+        if the backend supports it
+        """
+        return TokenBucket(config)
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteTaskQueue(BaseTaskQueue):
+    """
+    Task queue in an SQLite file, for workers on one machine or
+    on a shared disk. Carrier rate limits are kept in the same file.
+    Tasks whose lease expired max_attempts times are finished with error
+    """
+    def __init__(self, path: str, lease_timeout: float = 60, max_attempts: int = 5):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'id INTEGER PRIMARY KEY, task TEXT, done INTEGER DEFAULT 0, '
+            'worker TEXT, lease_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS tasks_lease ON tasks (done, lease_until)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results (task_id INTEGER PRIMARY KEY, result TEXT)')
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+
+    def put(self, tasks: Iterable[dict]) -> int:
+        count = 0
+        with self._transaction():
+            for task in tasks:
+                self._db.execute('INSERT INTO tasks (task) VALUES (?)', (json.dumps(task),))
+                count += 1
+        return count
+
+    def _fail_abandoned(self, now: float) -> None:
+        rows = self._db.execute(
+            'SELECT id, task FROM tasks WHERE done = 0 AND lease_until < ? AND attempts >= ?',
+            (now, self.max_attempts),
+        ).fetchall()
+        for task_id, task in rows:
+            task = json.loads(task)
+            result = ResultModel(
+                status=ResultStatus.error.value,
+                carrier=task.pop('carrier', None),
+                arguments=task,
+                errors=[f'Lease expired {self.max_attempts} times'],
+            )
+            self._db.execute(
+                'INSERT OR IGNORE INTO results VALUES (?, ?)', (task_id, json.dumps(asdict(result), default=json_default)))
+            self._db.execute('UPDATE tasks SET done = 1 WHERE id = ?', (task_id,))
+
+    def lease(self, worker_id: str, count: int = 1) -> list[Lease]:
+        now = time.time()
+        with self._transaction():
+            self._fail_abandoned(now)
+            rows = self._db.execute(
+                'SELECT id, task FROM tasks WHERE done = 0 AND lease_until < ? ORDER BY id LIMIT ?',
+                (now, count),
+            ).fetchall()
+            for task_id, _ in rows:
+                self._db.execute(
+                    'UPDATE tasks SET worker = ?, lease_until = ?, attempts = attempts + 1 '
+                    'WHERE id = ?',
+                    (worker_id, now + self.lease_timeout, task_id),
+                )
+
+        return [Lease(task_id, json.loads(task), worker_id) for task_id, task in rows]
+
+    def heartbeat(self, worker_id: str, task_ids: list[int]) -> None:
+        lease_until = time.time() + self.lease_timeout
+        with self._transaction():
+            self._db.executemany(
+                'UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND done = 0',
+                [(lease_until, task_id, worker_id) for task_id in task_ids],
+            )
+
+    def complete(self, lease: Lease, result: ResultModel) -> bool:
+        # a task leased again after its lease expired may be completed twice,
+        # the first result is kept
+        with self._transaction():
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO results VALUES (?, ?)',
+                (lease.task_id, json.dumps(asdict(result), default=json_default)),
+            )
+            self._db.execute('UPDATE tasks SET done = 1 WHERE id = ?', (lease.task_id,))
+        return cursor.rowcount == 1
+
+    def unfinished(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM tasks WHERE done = 0').fetchone()[0]
+
+    def results(self) -> Iterator[ResultModel]:
+        with self._lock:
+            rows = self._db.execute('SELECT result FROM results ORDER BY task_id').fetchall()
+
+        for row in rows:
+            yield ResultModel(**json.loads(row[0]))
+
+    def make_bucket(self, host: str, config: RateLimitConfig) -> TokenBucket:
+        return SQLiteTokenBucket(self.path, host, config)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class LeasedTaskSource:
+    """
+    Leases tasks from a queue in batches of batch_size, iteration stops when
+    no task can be leased right now. Held leases are extended by a heartbeat
+    thread until their results are completed
+    """
+    def __init__(self, queue: BaseTaskQueue, worker_id: str | None = None, batch_size: int = 10):
+        self.queue = queue
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.batch_size = batch_size
+        # task key -> leases of not yet finished tasks
+        self.leases: dict[str, list[Lease]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._heartbeat = None
+
+    def __iter__(self) -> Iterator[dict]:
+        while leases := self.queue.lease(self.worker_id, self.batch_size):
+            for lease in leases:
+                task = lease.task
+                with self._lock:
+                    self.leases.setdefault(input_task_key(task), []).append(lease)
+                # extractors change the task dict
+                yield dict(task)
+
+    def complete(self, result: ResultModel) -> bool:
+        """
+        Returns False if another worker completed the task first
+        """
+        with self._lock:
+            leases = self.leases.get(task_key(result.carrier, result.arguments))
+            if not leases:
+                return False
+            lease = leases.pop(0)
+            if not leases:
+                del self.leases[task_key(result.carrier, result.arguments)]
+
+        return self.queue.complete(lease, result)
+
+    def _beat(self, interval: float) -> None:
+        while not self._stopped.wait(interval):
+            with self._lock:
+                task_ids = [lease.task_id for leases in self.leases.values() for lease in leases]
+            if task_ids:
+                self.queue.heartbeat(self.worker_id, task_ids)
+
+    def start(self, interval: float) -> None:
+        self._heartbeat = threading.Thread(target=self._beat, args=(interval,), daemon=True)
+        self._heartbeat.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._heartbeat:
+            self._heartbeat.join()
+
+
+class QueueSink(BaseResultSink):
+    """
+    Completes results in the task queue, results this worker completed
+    first are passed on to sink
+    """
+    def __init__(self, source: LeasedTaskSource, sink: BaseResultSink):
+        self.source = source
+        self.sink = sink
+
+    @property
+    def results(self) -> list[ResultModel]:
+        return self.sink.results if isinstance(self.sink, ListSink) else []
+
+    def write(self, result: ResultModel) -> None:
+        if self.source.complete(result):
+            self.sink.write(result)
+
+    def close(self) -> None:
+        self.sink.close()
+
+
+def run_from_queue(
+    worker,
+    queue: BaseTaskQueue,
+    worker_id: str | None = None,
+    batch_size: int = 10,
+    poll_interval: float = 1.0,
+) -> None:
+    """
+    Runs the worker (scraper.scraper.Worker) on tasks leased from the queue
+    until every task of the queue is finished. Carrier rate limits are
+    shared through the queue
+    """
+    source = LeasedTaskSource(queue, worker_id, batch_size)
+    worker.sink = QueueSink(source, worker.sink)
+    worker.rate_limiter.bucket_factory = queue.make_bucket
+
+    source.start(queue.lease_timeout / 3)
+    try:
+        while True:
+            worker.add_task_stream(source, queue_size=batch_size)
+            worker.run_tasks()
+            # the rest is leased by other workers, their leases may expire
+            if not queue.unfinished():
+                break
+            time.sleep(poll_interval)
+    finally:
+        source.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export results stored in a task queue')
+    parser.add_argument('queue', help='SQLite task queue file')
+    parser.add_argument('-o', '--output', help='NDJSON output file, console if not set')
+    args = parser.parse_args()
+
+    queue = SQLiteTaskQueue(args.queue)
+    sink = NDJSONSink(args.output)
+    for result in queue.results():
+        sink.write(result)
+    sink.close()
+
+    unfinished = queue.unfinished()
+    queue.close()
+    if unfinished:
+        print(f'{unfinished} tasks are not finished yet', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
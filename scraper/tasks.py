@@ -0,0 +1,70 @@
+import itertools
+import json
+
+from typing import Iterator, TextIO
+
+
+def _read_array(file: TextIO, buffer: str, chunk_size: int) -> Iterator[dict]:
+    """
+    Decodes items of a JSON array one by one, reading the file in chunks
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+    pos = 0
+
+    while True:
+        # skip separators between items
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+
+        try:
+            if pos >= len(buffer):
+                raise json.JSONDecodeError('Unexpected end of data', buffer, pos)
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        # an item ending right at the buffer end may be a cut number
+        if end == len(buffer) and not eof and not isinstance(item, (dict, list, str)):
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        yield item
+        pos = end
+
+
+def iter_tasks(file: TextIO, chunk_size: int = 64 * 1024) -> Iterator[dict]:
+    """
+    Reads tasks lazily from NDJSON (one task per line) or from a JSON array,
+    only the current chunk of the file is kept in memory
+    """
+    buffer = ''
+    while not buffer.strip():
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        buffer += chunk
+
+    buffer = buffer.lstrip()
+    if buffer[0] == '[':
+        yield from _read_array(file, buffer[1:], chunk_size)
+        return
+
+    # NDJSON, complete the buffered lines and go on line by line
+    *lines, rest = buffer.split('\n')
+    lines.append(rest + file.readline())
+    for line in itertools.chain(lines, file):
+        if line.strip():
+            yield json.loads(line)
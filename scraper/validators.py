@@ -9,3 +9,10 @@ class BaseValidator(ABC):
     @abstractmethod
     def validate(self, value: str) -> str:
         pass
+
+    def validate_many(self, values: list[str | None]) -> list[str | None]:
+        """
+        Validates one column of values of an array section,
+        same results as calling validate for each of them
+        """
+        return [self.validate(value) for value in values]
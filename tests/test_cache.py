@@ -0,0 +1,70 @@
+import threading
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from scraper.cache import ResponseCache, CachingClient
+from scraper.clients import DefaultClient
+
+
+PAGES = {
+    # no charset, requests decodes text/html as ISO-8859-1
+    '/plain': ('text/html', 'Zürich'.encode()),
+    '/utf8': ('text/html; charset=utf-8', 'Zürich'.encode()),
+    '/json': ('application/json', '{"city": "Zürich"}'.encode()),
+}
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = PAGES[self.path]
+        if self.headers.get('If-None-Match') == f'"{self.path}"':
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', f'"{self.path}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _seen(response) -> tuple:
+    return response.status_code, response.encoding, response.text
+
+
+@pytest.mark.parametrize('path', list(PAGES))
+def test_cache_hit_matches_live_response(tmp_path, base_url, path):
+    url = base_url + path
+    live = _seen(DefaultClient().get(url))
+    client = CachingClient(DefaultClient(), ResponseCache(str(tmp_path)))
+
+    assert _seen(client.get(url)) == live
+    assert _seen(client.get(url)) == live
+    assert (client.misses, client.hits) == (1, 1)
+
+
+@pytest.mark.parametrize('path', list(PAGES))
+def test_revalidated_response_matches_live_response(tmp_path, base_url, path):
+    url = base_url + path
+    live = _seen(DefaultClient().get(url))
+    client = CachingClient(DefaultClient(), ResponseCache(str(tmp_path), ttl=0))
+
+    assert _seen(client.get(url)) == live
+    assert _seen(client.get(url)) == live
+    assert (client.misses, client.revalidated) == (1, 1)
@@ -0,0 +1,148 @@
+import datetime
+
+from decimal import Decimal
+
+import pytest
+
+from carriers.models import ParserConfig, DataConfig, FieldConfig
+from scraper.converters import DateConverter, DecimalConverter, PercentConverter
+from scraper.extractor import Extractor
+from scraper.extractors import HTMLValueExtractor
+from scraper.models import PageData
+from scraper.parsers import get_parser_backend
+from scraper.selectors import CSSSingleSelector, CSSMultiSelector
+from scraper.validators import BaseValidator
+
+
+VALUES = {
+    DateConverter: [
+        '01/02/2023', '1/2/2023', ' 01/02/2023 ', '01/02/2023', None, '', '   ',
+        '13/45/2023', 'soon', '2023-01-02', '02/29/2024', '02/29/2023',
+    ],
+    DecimalConverter: [
+        '$100.00', '$1,234.50', '(1.00)', '$100.00', ' 7 ', None, '', '-',
+        'NaN', 'Infinity', '12abc', '1e3', '€0.10', '(x)',
+    ],
+    PercentConverter: [
+        '12.5%', '0%', '100 %', '12.5%', '1,000%', None, '', '%', 'abc%', '(3%)', '-2.25%',
+    ],
+}
+
+
+def converters():
+    return [
+        DateConverter(),
+        DateConverter(('%m/%d/%Y', '%Y-%m-%d')),
+        DecimalConverter(),
+        PercentConverter(),
+        PercentConverter(fraction=True),
+    ]
+
+
+@pytest.mark.parametrize('converter', converters(), ids=lambda converter: type(converter).__name__)
+def test_convert_many_matches_convert(converter):
+    values = VALUES[type(converter)] * 3
+    expected = [type(converter)(**_options(converter)).convert(value) for value in values]
+
+    assert converter.convert_many(values) == expected
+    # answers from the memo are the same as the first parse
+    assert converter.convert_many(values) == expected
+    assert [converter.convert(value) for value in values] == expected
+
+
+def _options(converter) -> dict:
+    if isinstance(converter, DateConverter):
+        return {'formats': converter.formats}
+    if isinstance(converter, PercentConverter):
+        return {'fraction': converter.fraction}
+    return {}
+
+
+def test_converted_values():
+    assert DateConverter().convert_many(['1/2/2023', 'soon', None]) == [datetime.date(2023, 1, 2), None, None]
+    assert DecimalConverter().convert_many(['$1,234.50', '(1.00)', 'NaN']) == [Decimal('1234.50'), Decimal('-1.00'), None]
+    assert PercentConverter(fraction=True).convert_many(['12.5%', '']) == [Decimal('0.125'), None]
+
+
+def test_memo_eviction():
+    converter = DecimalConverter(max_size=2)
+    values = ['$1', '$2', '$3', '$1', None, '$2', 'x', '$3']
+
+    assert converter.convert_many(values) == [DecimalConverter().convert(value) for value in values]
+    assert len(converter._memo) <= 2
+    assert converter.convert('$4') == Decimal('4')
+    assert len(converter._memo) <= 2
+
+
+class NotEmpty(BaseValidator):
+    def validate(self, value: str) -> str:
+        return None if value else 'empty value'
+
+
+class NoDollar(BaseValidator):
+    def validate(self, value: str) -> str:
+        return 'has $' if value and '$' in value else ''
+
+
+def test_validate_many_matches_validate():
+    values = ['$1', '', None, '2', '$1', '   ']
+    for validator in (NotEmpty(), NoDollar()):
+        assert validator.validate_many(values) == [validator.validate(value) for value in values]
+
+
+ROWS = [
+    ('MI-1', '$100.00', '01/02/2023', '12.5%'),
+    ('MI-2', '', 'soon', '3%'),
+    ('MI-3', '$100.00', '01/02/2023', ''),
+    ('MI-4', 'n/a', '1/2/2023', '12.5%'),
+]
+
+
+def _page(rows) -> str:
+    items = ''.join(
+        f'<li class="row"><span class="id">{id_}</span><span class="premium">{premium}</span>'
+        f'<span class="date">{date}</span><span class="rate">{rate}</span></li>'
+        for id_, premium, date, rate in rows
+    )
+    # the last row has no rate element, its value is None
+    items += '<li class="row"><span class="id">MI-5</span><span class="premium">$5</span></li>'
+    return f'<html><body><ul id="policies">{items}</ul></body></html>'
+
+
+def _field(name: str, css: str, converter=None) -> FieldConfig:
+    return FieldConfig(
+        name=name,
+        selector=CSSSingleSelector(css),
+        extractor=HTMLValueExtractor(),
+        validators=[NotEmpty(), NoDollar()],
+        converter=converter,
+    )
+
+
+def test_array_section_matches_per_item_path():
+    data_conf = DataConfig(
+        name='policy',
+        array=True,
+        container_selector=CSSMultiSelector('#policies .row'),
+        fields=[
+            _field('id', '.id'),
+            _field('premium', '.premium', DecimalConverter()),
+            _field('effective_date', '.date', DateConverter()),
+            _field('commission_rate', '.rate', PercentConverter(fraction=True)),
+        ],
+    )
+    config = ParserConfig(url_template='http://carrier/<id>', multipage=False, data=[data_conf])
+    html_text = _page(ROWS)
+
+    page = Extractor.scrape_page(config, html_text, True)
+
+    expected = PageData()
+    html = get_parser_backend(config.parser).parse(html_text)
+    expected.data['policy'] = [
+        Extractor._scrape_item(data_conf, item, expected)
+        for item in data_conf.container_selector.select(html)
+    ]
+    assert len(page.data['policy']) == 5
+    assert page.data == expected.data
+    assert page.errors == expected.errors
+    assert page.errors
@@ -0,0 +1,58 @@
+import datetime
+
+from decimal import Decimal
+
+from scraper.journal import Journal, task_key, input_task_key
+from scraper.models import ResultModel, ResultStatus, PageData
+
+
+def test_input_task_key_leaves_out_options():
+    task = {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a', 'priority': 5, 'deadline': 60}
+
+    assert input_task_key(task) == task_key('MOCK_INDEMNITY', {'customerId': 'a'})
+    assert input_task_key(task) != task_key('MOCK_INDEMNITY', {'customerId': 'b'})
+    assert task_key('A', {'x': 1, 'y': 2}) == task_key('A', {'y': 2, 'x': 1})
+
+
+def _result(customer_id: str) -> ResultModel:
+    return ResultModel(
+        status=ResultStatus.done.value,
+        carrier='MOCK_INDEMNITY',
+        arguments={'customerId': customer_id},
+        data={'name': 'Jane'},
+    )
+
+
+def test_results_and_pages_survive_a_resume(tmp_path):
+    path = str(tmp_path / 'run.db')
+    key = task_key('MOCK_INDEMNITY', {'customerId': 'a'})
+    result = _result('done')
+    journal = Journal(path)
+    journal.record_page(key, 1, 'http://carrier/1', PageData({'premium': Decimal('1.50')}, ['bad row']))
+    journal.record_page(key, 2, 'http://carrier/2', PageData({'date': datetime.date(2023, 1, 2)}))
+    journal.record_result('done', result)
+    # the first result of a task is kept
+    journal.record_result('done', _result('other'))
+    journal.close()
+
+    journal = Journal(path, resume=True)
+    assert journal.get_result('done') == result
+    assert journal.get_result(key) is None
+    assert journal.get_pages(key) == [
+        (1, 'http://carrier/1', PageData({'premium': '1.50'}, ['bad row'])),
+        (2, 'http://carrier/2', PageData({'date': '2023-01-02'}, [])),
+    ]
+    journal.close()
+
+
+def test_new_run_starts_empty(tmp_path):
+    path = str(tmp_path / 'run.db')
+    journal = Journal(path)
+    journal.record_page('key', None, 'http://carrier', PageData({'a': 1}))
+    journal.record_result('key', _result('a'))
+    journal.close()
+
+    journal = Journal(path)
+    assert journal.get_result('key') is None
+    assert journal.get_pages('key') == []
+    journal.close()
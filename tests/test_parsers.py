@@ -0,0 +1,28 @@
+import pytest
+
+from scraper.extractors import RegexExtractor, CustomExtractor
+from scraper.parsers import PARSER_BACKENDS, HTMLParserBackend, get_parser_backend
+
+
+HTML = '<html><body><div id="empty" data-id="MI-1"></div><p id="text">Policy MI-2</p></body></html>'
+
+
+@pytest.mark.parametrize('name', list(PARSER_BACKENDS))
+def test_empty_elements_are_truthy(name):
+    html = get_parser_backend(name).parse(HTML)
+    empty = html.select_one('#empty')
+
+    assert empty
+    assert RegexExtractor(r'MI-\d+').extract(empty) == 'MI-1'
+    assert CustomExtractor(lambda element: element.get('data-id')).extract(empty) == 'MI-1'
+    assert RegexExtractor(r'MI-\d+').extract(html.select_one('#text')) == 'MI-2'
+
+
+def test_missing_backend_falls_back_to_html_parser(capsys):
+    names = list(PARSER_BACKENDS)
+
+    assert isinstance(get_parser_backend('not-installed'), HTMLParserBackend)
+    assert isinstance(get_parser_backend('not-installed'), HTMLParserBackend)
+    assert list(PARSER_BACKENDS) == names
+    # reported once
+    assert capsys.readouterr().err.count('not available') == 1
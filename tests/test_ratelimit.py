@@ -0,0 +1,74 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from carriers.models import RateLimitConfig
+from scraper.ratelimit import TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('') is None
+    assert parse_retry_after('12') == 12.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('soon') is None
+
+    retry_at = datetime.now(UTC) + timedelta(seconds=60)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(60, abs=2)
+    # '-0000' dates have no known zone, they are UTC
+    naive = format_datetime(retry_at.replace(tzinfo=None))
+    assert naive.endswith('-0000')
+    assert parse_retry_after(naive) == pytest.approx(60, abs=2)
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _bucket(**options) -> tuple[TokenBucket, Clock]:
+    bucket = TokenBucket(RateLimitConfig(**options))
+    bucket.clock = Clock()
+    return bucket, bucket.clock
+
+
+def test_tokens_are_spaced_by_the_rate():
+    bucket, clock = _bucket(rate=2.0)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.5, 1.0]
+    clock.now += 1.0
+    assert bucket.delay() == 0.5
+
+
+def test_burst_tokens_are_available_at_once():
+    bucket, _ = _bucket(rate=1.0, burst=3)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 1.0]
+
+
+def test_rate_adapts_between_its_limits():
+    bucket, _ = _bucket(rate=4.0, min_rate=1.0, max_rate=5.0, increase=1.0, decrease=0.5)
+
+    bucket.on_success()
+    bucket.on_success()
+    assert bucket.rate == 5.0
+    bucket.on_throttle()
+    assert bucket.rate == 2.5
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 1.0
+    assert bucket.throttled == 3
+
+
+def test_throttle_blocks_until_retry_after():
+    bucket, clock = _bucket(rate=10.0)
+
+    bucket.on_throttle(retry_after=30)
+    assert bucket.delay() == 30
+    clock.now += 30
+    assert bucket.reserve() == 0.0
@@ -0,0 +1,120 @@
+import math
+import time
+
+from dataclasses import dataclass
+
+import pytest
+
+from scraper.models import ResultStatus
+from scraper.scheduler import Scheduler, parse_deadline, parse_priority
+from scraper.scraper import Worker
+
+
+@dataclass(eq=False)
+class Task:
+    name: str
+    host: str = 'a.example'
+    carrier_id: str = 'A'
+    priority: int = 0
+    deadline: float | None = None
+    sequence: int | None = None
+
+
+def drain(scheduler: Scheduler) -> list[str]:
+    names = []
+    while scheduler:
+        names.append(scheduler.pop().name)
+    return names
+
+
+def test_priority_then_deadline_then_queue_order():
+    scheduler = Scheduler()
+    for task in [
+        Task('late', deadline=200),
+        Task('first'),
+        Task('urgent', priority=5),
+        Task('soon', deadline=100),
+        Task('second'),
+    ]:
+        scheduler.push(task)
+
+    assert drain(scheduler) == ['urgent', 'soon', 'late', 'first', 'second']
+
+
+def test_requeued_task_keeps_its_place():
+    scheduler = Scheduler()
+    first, second = Task('first'), Task('second')
+    scheduler.push(first)
+    scheduler.push(second)
+
+    assert scheduler.pop() is first
+    scheduler.push(first)
+    assert drain(scheduler) == ['first', 'second']
+
+
+def test_hosts_take_turns_then_carriers_of_a_host():
+    scheduler = Scheduler()
+    for i in range(2):
+        scheduler.push(Task(f'a{i}', host='a.example', carrier_id='A'))
+        scheduler.push(Task(f'b{i}', host='a.example', carrier_id='B'))
+        scheduler.push(Task(f'c{i}', host='c.example', carrier_id='C'))
+
+    # a.example serves one of its carriers per turn, c.example gets every other turn
+    assert drain(scheduler) == ['a0', 'c0', 'b0', 'c1', 'a1', 'b1']
+
+
+def test_hosts_not_ready_are_skipped():
+    scheduler = Scheduler(lambda task: 5.0 if task.host == 'slow.example' else 0.0)
+    scheduler.push(Task('slow', host='slow.example', priority=10))
+    scheduler.push(Task('fast', host='fast.example'))
+
+    assert scheduler.pop().name == 'fast'
+    assert scheduler.pop() is None
+    assert scheduler.wait_time() == 5.0
+    assert len(scheduler) == 1
+
+
+def test_empty_scheduler():
+    scheduler = Scheduler()
+    assert scheduler.pop() is None
+    assert scheduler.wait_time() == math.inf
+
+
+def test_parse_priority():
+    assert parse_priority(None) == 0
+    assert parse_priority(3) == 3
+    assert parse_priority(-1.5) == -1.5
+    for value in ('high', '3', True, [1], {}, math.nan, math.inf):
+        with pytest.raises(ValueError):
+            parse_priority(value)
+
+
+def test_parse_deadline():
+    assert parse_deadline(None) is None
+    assert abs(parse_deadline(60) - (time.time() + 60)) < 1
+    assert parse_deadline('2030-01-01T00:00:00') == parse_deadline('2030-01-01T00:00:00+00:00')
+    for value in ('soon', True, [60], {}, math.nan):
+        with pytest.raises(ValueError):
+            parse_deadline(value)
+
+
+def test_bad_scheduling_options_fail_only_their_task():
+    worker = Worker()
+    try:
+        worker.add_tasks([
+            {'carrier': 'MOCK_INDEMNITY', 'customerId': 'bad-priority', 'priority': 'high'},
+            {'carrier': 'MOCK_INDEMNITY', 'customerId': 'bad-deadline', 'deadline': 'soon'},
+            {'carrier': 'MOCK_INDEMNITY', 'customerId': 'good', 'priority': 1, 'deadline': 60},
+        ])
+
+        assert [task.arguments for task in worker.tasks] == [{'customerId': 'good'}]
+        results = worker.scraped_data
+        assert [result.arguments for result in results] == [
+            {'customerId': 'bad-priority'},
+            {'customerId': 'bad-deadline'},
+        ]
+        assert all(result.status == ResultStatus.error.value for result in results)
+        assert 'invalid task priority' in results[0].errors[0]
+        assert 'invalid task deadline' in results[1].errors[0]
+    finally:
+        worker.close()
@@ -0,0 +1,71 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from scraper.models import ResultStatus
+from scraper.scraper import AsyncWorker
+from scraper.service import ScrapeService, make_server, validate_task
+
+
+BAD_TASKS = [
+    ['not', 'a', 'task'],
+    {'customerId': 'a'},
+    {'carrier': ['MOCK_INDEMNITY'], 'customerId': 'a'},
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': {'id': 'a'}},
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a', 'priority': 'high'},
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a', 'priority': True},
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a', 'deadline': 'soon'},
+]
+
+
+@pytest.mark.parametrize('task', BAD_TASKS)
+def test_validate_task_rejects(task):
+    assert validate_task(task)
+
+
+def test_validate_task_accepts():
+    assert validate_task({'carrier': 'MOCK_INDEMNITY', 'customerId': 'a'}) is None
+    assert validate_task(
+        {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a', 'priority': 2.5, 'deadline': '2030-01-01'}) is None
+
+
+@pytest.fixture
+def service_url():
+    service = ScrapeService(AsyncWorker(), wait_timeout=10).start()
+    server = make_server('127.0.0.1:0', service)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def call(method: str, url: str, body: bytes | None = None) -> tuple[int, dict]:
+    request = urllib.request.Request(url, data=body, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_bad_tasks_are_rejected_and_the_service_keeps_running(service_url):
+    for task in BAD_TASKS:
+        status, body = call('POST', f'{service_url}/batches', json.dumps([task]).encode())
+        assert status == 400
+        assert body['error']
+
+    assert call('POST', f'{service_url}/batches', b'[{"carrier": ')[0] == 400
+
+    # an unknown carrier is a task error, not a rejected batch
+    status, body = call('POST', f'{service_url}/batches?wait=1', b'{"carrier": "NOPE", "customerId": "a"}')
+    assert status == 200
+    assert body['done']
+    assert [result['status'] for result in body['results']] == [ResultStatus.error.value]
+
+    status, body = call('GET', f'{service_url}/status')
+    assert status == 200
+    assert body['error'] is None
@@ -0,0 +1,94 @@
+import time
+
+from carriers.models import RateLimitConfig
+from scraper.models import ResultModel, ResultStatus
+from scraper.taskqueue import SQLiteTaskQueue
+
+
+TASKS = [{'carrier': 'MOCK_INDEMNITY', 'customerId': str(i)} for i in range(3)]
+
+
+def _result(task: dict) -> ResultModel:
+    return ResultModel(
+        status=ResultStatus.done.value,
+        carrier=task['carrier'],
+        arguments={'customerId': task['customerId']},
+    )
+
+
+def test_leased_tasks_are_hidden_from_other_workers(tmp_path):
+    queue = SQLiteTaskQueue(str(tmp_path / 'queue.db'))
+    assert queue.put(iter(TASKS)) == 3
+
+    first = queue.lease('worker-1', 2)
+    second = queue.lease('worker-2', 2)
+    assert [lease.task for lease in first] == TASKS[:2]
+    assert [lease.task for lease in second] == TASKS[2:]
+    assert queue.lease('worker-3') == []
+
+    for lease in first + second:
+        assert queue.complete(lease, _result(lease.task))
+    assert queue.unfinished() == 0
+    assert [result.arguments for result in queue.results()] == [{'customerId': str(i)} for i in range(3)]
+    queue.close()
+
+
+def test_expired_lease_is_leased_again_and_first_result_kept(tmp_path):
+    queue = SQLiteTaskQueue(str(tmp_path / 'queue.db'), lease_timeout=0.05)
+    queue.put(TASKS[:1])
+
+    [lost] = queue.lease('worker-1')
+    time.sleep(0.1)
+    [again] = queue.lease('worker-2')
+    assert again.task_id == lost.task_id
+
+    assert queue.complete(again, _result(again.task))
+    assert not queue.complete(lost, _result(lost.task))
+    assert queue.unfinished() == 0
+    queue.close()
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = SQLiteTaskQueue(str(tmp_path / 'queue.db'), lease_timeout=0.2)
+    queue.put(TASKS[:1])
+
+    [lease] = queue.lease('worker-1')
+    for _ in range(3):
+        time.sleep(0.1)
+        queue.heartbeat('worker-1', [lease.task_id])
+        assert queue.lease('worker-2') == []
+    queue.close()
+
+
+def test_task_fails_after_max_attempts(tmp_path):
+    queue = SQLiteTaskQueue(str(tmp_path / 'queue.db'), lease_timeout=0.01, max_attempts=2)
+    queue.put(TASKS[:1])
+
+    for _ in range(2):
+        assert len(queue.lease('worker-1')) == 1
+        time.sleep(0.02)
+
+    assert queue.lease('worker-1') == []
+    assert queue.unfinished() == 0
+    [result] = queue.results()
+    assert result.status == ResultStatus.error.value
+    assert result.arguments == {'customerId': '0'}
+    queue.close()
+
+
+def test_rate_limits_are_shared_through_the_queue(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    config = RateLimitConfig(rate=1.0)
+    queue = SQLiteTaskQueue(path)
+    first = queue.make_bucket('carrier.example', config)
+    second = SQLiteTaskQueue(path).make_bucket('carrier.example', config)
+
+    assert first.reserve() <= 0
+    # the token taken by the first worker delays the second one
+    assert second.delay() > 0.5
+    first.on_throttle(retry_after=30)
+    assert second.delay() > 29
+    assert second.rate == config.rate * config.decrease
+    first.close()
+    second.close()
+    queue.close()
@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+from scraper.tasks import iter_tasks
+
+
+TASKS = [
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': 'a0dfjw9a', 'priority': 10},
+    {'carrier': 'PLACEHOLDER_CARRIER', 'customerId': 'f02dkl4e', 'deadline': 12345.5},
+    {'carrier': 'MOCK_INDEMNITY', 'customerId': 'brace } and , inside', 'priority': -1},
+]
+
+
+def _formats() -> dict[str, str]:
+    return {
+        'array': json.dumps(TASKS, indent=2),
+        'compact array': json.dumps(TASKS),
+        'ndjson': '\n'.join(json.dumps(task) for task in TASKS) + '\n',
+        'ndjson with blank lines': '\n\n' + '\n\n'.join(json.dumps(task) for task in TASKS),
+    }
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+@pytest.mark.parametrize('text', list(_formats().values()), ids=list(_formats()))
+def test_iter_tasks(text, chunk_size):
+    assert list(iter_tasks(io.StringIO(text), chunk_size=chunk_size)) == TASKS
+
+
+@pytest.mark.parametrize('text', ['', '  \n', '[]', '[ ]'])
+def test_no_tasks(text):
+    assert list(iter_tasks(io.StringIO(text), chunk_size=1)) == []
+
+
+def test_numbers_cut_by_a_chunk_are_read_whole():
+    assert list(iter_tasks(io.StringIO('[12345, 678]'), chunk_size=3)) == [12345, 678]
+
+
+@pytest.mark.parametrize('text', ['[{"carrier": ', '{"carrier": "A"}\n{"carrier"\n'])
+def test_invalid_json(text):
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_tasks(io.StringIO(text), chunk_size=4))